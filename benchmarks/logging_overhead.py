@@ -0,0 +1,112 @@
+"""
+Measures logging overhead per request.
+
+Each simulated request logs what a real one does: an account message at INFO and the
+urllib3 connection pool messages at DEBUG. Requests run from several threads, like
+`run_for_accounts`, logging to a file either directly on the calling thread or through
+the queue listener, with f-string or deferred %-style messages.
+
+Times are what the requesting threads spend logging; with the listener, records are
+written afterwards on its thread.
+
+Usage: python benchmarks/logging_overhead.py [--requests N] [--workers N]
+"""
+
+import argparse
+import logging
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from nepseutils.utils.logging import LOG_FORMAT, start_listener, stop_listener
+
+LEVELS = {"ERROR": logging.ERROR, "INFO": logging.INFO, "DEBUG": logging.DEBUG}
+
+urllib3_logger = logging.getLogger("urllib3.connectionpool")
+
+
+def request_eager(name: str, page: int) -> None:
+    logging.info(f"Fetching application reports page {page} for user: {name}")
+    urllib3_logger.debug(
+        f'https://webbackend.cdsc.com.np:443 "POST /api/meroShare/applicantForm/active/search/ HTTP/1.1" '
+        f"200 {page}"
+    )
+
+
+def request_lazy(name: str, page: int) -> None:
+    logging.info("Fetching application reports page %s for user: %s", page, name)
+    urllib3_logger.debug(
+        '%s://%s:%s "%s %s %s" %s %s',
+        "https",
+        "webbackend.cdsc.com.np",
+        443,
+        "POST",
+        "/api/meroShare/applicantForm/active/search/",
+        "HTTP/1.1",
+        200,
+        page,
+    )
+
+
+def configure(mode: str, level: int, path: Path) -> None:
+    handler = logging.FileHandler(path)
+
+    if mode == "queue":
+        start_listener(level, handler)
+    else:
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        logging.basicConfig(level=level, force=True, handlers=[handler])
+
+
+def measure(request, requests: int, workers: int) -> float:
+    """
+    Returns seconds the requesting threads spent logging, per request.
+    """
+    per_worker = requests // workers
+    barrier = threading.Barrier(workers + 1)
+    elapsed = [0.0] * workers
+
+    def work(index: int) -> None:
+        name = f"Account {index}"
+        barrier.wait()
+
+        start = time.perf_counter()
+        for page in range(per_worker):
+            request(name, page)
+        elapsed[index] = time.perf_counter() - start
+
+    threads = [threading.Thread(target=work, args=(index,)) for index in range(workers)]
+    for thread in threads:
+        thread.start()
+
+    barrier.wait()
+    for thread in threads:
+        thread.join()
+
+    return sum(elapsed) / (per_worker * workers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NepseUtils logging overhead benchmark")
+    parser.add_argument("--requests", type=int, default=50_000)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    print(f"{'Level':<8}{'Handler':<10}{'Messages':<10}{'Per request (us)':>18}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for level_name, level in LEVELS.items():
+            for mode in ("direct", "queue"):
+                for messages, request in (("f-string", request_eager), ("lazy", request_lazy)):
+                    configure(mode, level, Path(directory) / "nepseutils.log")
+                    seconds = measure(request, args.requests, args.workers)
+                    stop_listener()
+
+                    print(f"{level_name:<8}{mode:<10}{messages:<10}{seconds * 1_000_000:>18.2f}")
+
+    logging.basicConfig(force=True, handlers=[logging.NullHandler()])
+
+
+if __name__ == "__main__":
+    main()
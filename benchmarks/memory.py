@@ -0,0 +1,97 @@
+"""
+Measures memory used by loaded account state.
+
+Builds a synthetic config with many accounts, issues and portfolio entries, then loads it
+with the slotted models and with equivalent `__dict__` based objects for comparison.
+
+Usage: python benchmarks/memory.py [--accounts N] [--issues N] [--entries N]
+"""
+
+import argparse
+import gc
+import tracemalloc
+from types import SimpleNamespace
+
+from nepseutils.core.account import Account
+from nepseutils.core.issue import Issue
+from nepseutils.core.portfolio import Portfolio, PortfolioEntry
+
+
+def synthetic_config(accounts: int, issues: int, entries: int) -> list[dict]:
+    portfolio = Portfolio(
+        [PortfolioEntry(10, 500.0, 490.0, f"S{i}", f"Scrip {i}", 5000.0, 4900.0) for i in range(entries)],
+        entries,
+        5000.0 * entries,
+        4900.0 * entries,
+    ).to_json()
+
+    return [
+        Account(
+            f"13010000{index:08d}",
+            "password",
+            1234,
+            1,
+            "crn",
+            name=f"Account {index}",
+            portfolio=Portfolio.from_json(portfolio),
+            issues=[
+                Issue(f"Company {i}", f"C{i}", "Alloted", "IPO", str(i), str(index * issues + i), old=True)
+                for i in range(issues)
+            ],
+        ).to_json()
+        for index in range(accounts)
+    ]
+
+
+def load_slotted(config: list[dict]) -> list:
+    return [Account.from_json(account) for account in config]
+
+
+def load_dict(config: list[dict]) -> list:
+    """
+    Same data held in objects with a per instance `__dict__`, like the models before slots.
+    """
+    return [
+        SimpleNamespace(
+            **{
+                **account,
+                "portfolio": SimpleNamespace(
+                    **{
+                        **account["portfolio"],
+                        "entries": [SimpleNamespace(**entry) for entry in account["portfolio"]["entries"]],
+                    }
+                ),
+                "issues": [SimpleNamespace(**issue) for issue in account["issues"]],
+            }
+        )
+        for account in config
+    ]
+
+
+def measure(load, config: list[dict]) -> int:
+    gc.collect()
+    tracemalloc.start()
+    loaded = load(config)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del loaded
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NepseUtils memory benchmark")
+    parser.add_argument("--accounts", type=int, default=1000)
+    parser.add_argument("--issues", type=int, default=50)
+    parser.add_argument("--entries", type=int, default=20)
+    args = parser.parse_args()
+
+    config = synthetic_config(args.accounts, args.issues, args.entries)
+
+    print(f"{'Models':<10}{'Memory (MiB)':>14}{'Per account (KiB)':>20}")
+    for name, load in (("__dict__", load_dict), ("slots", load_slotted)):
+        size = measure(load, config)
+        print(f"{name:<10}{size / 2**20:>14.1f}{size / 2**10 / args.accounts:>20.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Measures CLI startup time.
+
+Every scenario runs in a fresh interpreter against a synthetic config in a temporary
+HOME, so results include interpreter start and imports, like a real invocation.
+
+Usage: python benchmarks/startup.py [--accounts N] [--repeat N]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SETUP = """
+from nepseutils.core.account import Account
+from nepseutils.core.meroshare import MeroShare
+
+ms = MeroShare(
+    fernet=MeroShare.fernet_init("benchmark"),
+    accounts=[Account(f"13010000{{i:08d}}", "password", 1234, 1, "crn") for i in range({accounts})],
+    capitals={{"13010": 1}},
+    config_path=MeroShare.default_config_path(),
+)
+ms.save_data()
+ms.close()
+"""
+
+SCENARIOS = {
+    "--help": ["-m", "nepseutils", "--help"],
+    "unlock": [
+        "-c",
+        "from nepseutils.core.meroshare import MeroShare; MeroShare.load('benchmark')",
+    ],
+    "list accounts": [
+        "-c",
+        "from nepseutils.__main__ import NepseUtils\n"
+        "from nepseutils.core.meroshare import MeroShare\n"
+        "shell = NepseUtils()\n"
+        "shell.ms = MeroShare.load('benchmark')\n"
+        "shell.onecmd('list accounts')",
+    ],
+}
+
+
+def run(args: list[str], env: dict) -> float:
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, *args], env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NepseUtils startup benchmark")
+    parser.add_argument("--accounts", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as home:
+        env = {**os.environ, "HOME": home, "APPDATA": home}
+        config_directory = os.path.join(home, ".config", "nepseutils")
+        os.makedirs(config_directory, exist_ok=True)
+
+        subprocess.run(
+            [sys.executable, "-c", SETUP.format(accounts=args.accounts)],
+            env=env,
+            check=True,
+        )
+
+        print(f"{'Scenario':<16}{'Median (ms)':>14}{'Min (ms)':>12}")
+        for name, scenario in SCENARIOS.items():
+            timings = [run(scenario, env) * 1000 for _ in range(args.repeat)]
+            print(f"{name:<16}{statistics.median(timings):>14.1f}{min(timings):>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,11 @@
-from nepseutils.core.meroshare import MeroShare
-
 from .version import __version__
+
+
+def __getattr__(name):
+    # MeroShare pulls in heavy dependencies, import it only when accessed
+    if name == "MeroShare":
+        from nepseutils.core.meroshare import MeroShare
+
+        return MeroShare
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -5,20 +5,27 @@ import logging
 import os
 from cmd import Cmd
 from getpass import getpass
+from pathlib import Path
 
-from cryptography.fernet import InvalidToken
-from tabulate import tabulate
-
+from nepseutils.constants import ARM_WORKERS, DEFAULT_WORKERS
 from nepseutils.core.account import Account
 from nepseutils.core.errors import LocalException
 from nepseutils.core.meroshare import MeroShare
-from nepseutils.core.portfolio import PortfolioEntry
-from nepseutils.utils import config_converter
+from nepseutils.core.portfolio import Portfolio
+from nepseutils.utils import agent, http, metrics, profiling, resilience, tracing
+from nepseutils.utils.parallel import AccountResult
 
 logging.basicConfig(format="%(asctime)s %(message)s", level=logging.INFO)
 logging.getLogger("urllib3").setLevel(logging.ERROR)
 
 
+def tabulate(*args, **kwargs) -> str:
+    # Imported on first use to keep startup fast
+    from tabulate import tabulate
+
+    return tabulate(*args, **kwargs)
+
+
 class NepseUtils(Cmd):
     prompt = "NepseUtils > "
     intro = "Welcome to NepseUtils! Type ? for help!"
@@ -26,7 +33,11 @@ class NepseUtils(Cmd):
     ms: MeroShare
 
     def preloop(self, *args, **kwargs):
+        from cryptography.fernet import InvalidToken
+
         if not (MeroShare.default_config_path()).exists():
+            from nepseutils.utils import config_converter
+
             config_converter.pre_versioning_to_current()
 
             logging.info("Creating a new data file! Existing file not found!")
@@ -36,6 +47,9 @@ class NepseUtils(Cmd):
             password = getpass(prompt="Set a password to unlock: ")
             self.ms = MeroShare.new(password)
 
+        elif MeroShare.agent_available() and (ms := NepseUtils.load_from_agent()):
+            self.ms = ms
+
         else:
             password = getpass(prompt="Enter password to unlock: ")
 
@@ -46,6 +60,27 @@ class NepseUtils(Cmd):
                 print(e)
                 exit()
 
+    @staticmethod
+    def load_from_agent() -> MeroShare | None:
+        """
+        Loads data from the unlock agent. If its key no longer decrypts the data, e.g. since
+        the password was changed, the agent is locked and None is returned.
+        """
+        from cryptography.fernet import InvalidToken
+
+        try:
+            return MeroShare.load_from_agent()
+        except (LocalException, InvalidToken) as e:
+            print(f"Unlock agent could not decrypt data, locking it! {e}")
+            MeroShare.lock_agent()
+            return None
+
+    def onecmd(self, line):
+        # Every save made while running a command is written once when it finishes.
+        # Only the command name is traced since arguments may contain passwords.
+        with tracing.span("command", command=line.split()[0] if line.split() else None), self.ms.batch():
+            return super().onecmd(line)
+
     def help_add(self):
         print("Add a new account!")
         print("Usage: add {dmat} {password} {crn} {pin}")
@@ -92,8 +127,7 @@ class NepseUtils(Cmd):
         except LocalException as e:
             print(f"Failed to obtain details for account: {e}")
 
-        self.ms.accounts.append(account)
-        self.ms.save_data()
+        self.ms.add_account(account)
 
         logging.info(f"Successfully obtained details for account: {account.name}")
 
@@ -105,8 +139,7 @@ class NepseUtils(Cmd):
     def do_remove(self, args):
         self.do_list(args="accounts")
         account_id = input("Choose an account ID: ")
-        del self.ms.accounts[int(account_id) - 1]
-        self.ms.save_data()
+        self.ms.remove_account(self.ms.accounts[int(account_id) - 1])
         print("Account removed!")
 
     def list_accounts_full(self):
@@ -166,32 +199,17 @@ class NepseUtils(Cmd):
         print("Usage: portfolio {account_id}")
         print("OR")
         print("Usage: portfolio all")
+        print("OR")
+        print("Usage: portfolio tags")
 
     def do_portfolio(self, args):
-        portfolio: list[PortfolioEntry] = []
-
         if args == "all":
-            for account in self.ms.accounts:
-                if len(account.portfolio.entries) == 0:
-                    account.fetch_portfolio()
-
-                for entry in account.portfolio.entries:
-                    found = False
-
-                    for combined_entry in portfolio:
-                        if combined_entry.script == entry.script:
-                            combined_entry.current_balance += entry.current_balance
-                            combined_entry.value_as_of_last_transaction_price += (
-                                entry.value_as_of_last_transaction_price
-                            )
-                            combined_entry.value_as_of_previous_closing_price += (
-                                entry.value_as_of_previous_closing_price
-                            )
-                            found = True
-                            break
-
-                    if not found:
-                        portfolio.append(PortfolioEntry.from_json(entry.to_json()))
+            self.print_portfolio(self.ms.aggregate_portfolio())
+
+        elif args == "tags":
+            for tag, portfolio in self.ms.aggregate_portfolio_by_tag().items():
+                print(f"Tag: {tag or 'Untagged'}")
+                self.print_portfolio(portfolio)
 
         else:
             self.list_accounts()
@@ -202,13 +220,10 @@ class NepseUtils(Cmd):
             if len(account.portfolio.entries) == 0:
                 account.fetch_portfolio()
 
-            portfolio = account.portfolio.entries
+            self.print_portfolio(account.portfolio)
 
-        total_value = 0.0
-        total_value_as_of_closing = 0.0
-        for entry in portfolio:
-            total_value += entry.value_as_of_last_transaction_price
-            total_value_as_of_closing += entry.value_as_of_previous_closing_price
+    def print_portfolio(self, portfolio: Portfolio):
+        total_value, total_value_as_of_closing = Portfolio.totals(portfolio.entries)
 
         headers = [
             "Scrip",
@@ -228,13 +243,15 @@ class NepseUtils(Cmd):
                 f"{itm.last_transaction_price:,.1f}",
                 f"{itm.value_as_of_previous_closing_price:,.1f}",
                 f"{itm.value_as_of_last_transaction_price:,.1f}",
-                f"{itm.value_as_of_last_transaction_price - itm.value_as_of_previous_closing_price:,.1f}",
-                f"{(itm.value_as_of_last_transaction_price - itm.value_as_of_previous_closing_price) / itm.value_as_of_previous_closing_price * 100:,.2f}%",
+                f"{diff:,.1f}",
+                f"{diff_percent:,.2f}%",
             ]
-            for itm in portfolio
+            for itm, (diff, diff_percent) in zip(portfolio.entries, portfolio.changes())
         ]
         total_diff = total_value - total_value_as_of_closing
-        total_diff_percent = total_diff / total_value_as_of_closing * 100
+        total_diff_percent = (
+            total_diff / total_value_as_of_closing * 100 if total_value_as_of_closing else 0.0
+        )
         table.append(
             [
                 "Total",
@@ -294,13 +311,25 @@ class NepseUtils(Cmd):
 
     def help_sync(self):
         print("Syncs unfetched portfolio and application status from MeroShare!")
+        print("Usage: sync [full] [workers]")
+        print("full: Refetches whole application history including migrated applications")
 
     def do_sync(self, args):
-        for account in self.ms.accounts:
-            account.fetch_portfolio()
-            account.fetch_applied_issues()
-            account.fetch_applied_issues_status()
-            print(f"Synced {account.name}!")
+        args = args.split()
+        full = "full" in args
+        workers = next((int(arg) for arg in args if arg.isdigit()), DEFAULT_WORKERS)
+
+        def on_progress(result: AccountResult, completed: int, total: int):
+            if result.ok:
+                print(f"[{completed}/{total}] Synced {result.account.name}!")
+            else:
+                print(f"[{completed}/{total}] Failed to sync {result.account.name}: {result.error}")
+
+        results = self.ms.sync(workers=workers, on_progress=on_progress, full=full)
+        failed = [result for result in results if not result.ok]
+
+        if failed:
+            print(f"Failed to sync {len(failed)} of {len(results)} accounts!")
 
     def help_stats(self):
         print("Shows statistics of accounts!")
@@ -378,11 +407,7 @@ class NepseUtils(Cmd):
         headers = ["Name", "Alloted", "Quantity"]
         table = []
         for account in self.ms.accounts:
-            issue_ins = None
-            for issue in account.issues:
-                if issue.company_share_id == int(company_id):
-                    issue_ins = issue
-                    break
+            issue_ins = account.issues.by_company_share_id(company_id)
 
             if not issue_ins:
                 table.append([account.name, "N/A", ""])
@@ -414,7 +439,7 @@ class NepseUtils(Cmd):
             print(f"Invalid tag {tag}. Setting to None")
 
         account.tag = tag
-        self.ms.save_data()
+        self.ms.save_data(account)
 
     def help_tag(self):
         print("Tag an account to group them!")
@@ -425,11 +450,12 @@ class NepseUtils(Cmd):
     def do_apply(self, args):
         company_to_apply = None
         quantity = None
+        workers = int(args) if args.strip().isdigit() else DEFAULT_WORKERS
 
         apply_headers = ["Name", "Quantity", "Applied", "Message"]
         apply_table = []
 
-        appicable_issues = self.ms.default_account.fetch_applicable_issues()
+        appicable_issues = self.ms.issue_catalog.issues(refresh=True)
 
         headers = [
             "Share ID",
@@ -456,25 +482,19 @@ class NepseUtils(Cmd):
         company_to_apply = input("Enter Share ID: ")
         quantity = input("Units to Apply: ")
 
-        for account in self.ms.accounts:
-            if not company_to_apply:
-                appicable_issues = account.fetch_applicable_issues()
+        results = self.ms.apply(share_id=int(company_to_apply), quantity=int(quantity), workers=workers)
 
-            try:
-                result = account.apply(share_id=int(company_to_apply), quantity=int(quantity))
-            except Exception as e:
-                print(e)
-                print(f"Failed to apply for {account.name}!")
+        for account_result in results:
+            if account_result.ok:
+                result = account_result.result
+            else:
+                print(account_result.error)
+                print(f"Failed to apply for {account_result.account.name}!")
                 result = {"status": "FAILED", "message": "Failed to apply!"}
 
-            try:
-                account.logout()
-            except:
-                print(f"Failed to logout for {account.name}!")
-
             apply_table.append(
                 [
-                    account.name,
+                    account_result.account.name,
                     quantity,
                     result.get("status") == "CREATED",
                     result.get("message"),
@@ -485,6 +505,58 @@ class NepseUtils(Cmd):
 
     def help_apply(self):
         print("Apply for shares")
+        print("Usage: apply [workers]")
+
+    def help_arm(self):
+        print("Prepares applications of all accounts ahead of time and submits them at the given time")
+        print("Usage: arm {share_id} {units} {HH:MM[:SS] | YYYY-MM-DDTHH:MM[:SS]} [workers]")
+
+    def do_arm(self, args):
+        from datetime import datetime
+
+        args = args.split()
+
+        if len(args) < 3 or not args[0].isdigit() or not args[1].isdigit():
+            print("Invalid arguments!")
+            return
+
+        try:
+            if "T" in args[2]:
+                fire_at = datetime.fromisoformat(args[2])
+            else:
+                time_format = "%H:%M:%S" if args[2].count(":") == 2 else "%H:%M"
+                fire_at = datetime.combine(
+                    datetime.now().date(), datetime.strptime(args[2], time_format).time()
+                )
+        except ValueError:
+            print("Invalid time!")
+            return
+
+        if fire_at <= datetime.now():
+            print("Time must be in the future!")
+            return
+
+        workers = int(args[3]) if len(args) > 3 and args[3].isdigit() else ARM_WORKERS
+
+        print(f"Armed! Applying at {fire_at}. Keep NepseUtils running until then.")
+        results = self.ms.arm(int(args[0]), int(args[1]), fire_at.timestamp(), workers)
+
+        headers = ["Name", "Applied", "Submitted After (ms)", "Message"]
+        table = []
+        for account_result in results:
+            if account_result.ok:
+                response, elapsed = account_result.result
+                table.append(
+                    [account_result.account.name, True, f"{elapsed * 1000:,.0f}", response.get("message")]
+                )
+            else:
+                table.append([account_result.account.name, False, "", account_result.error])
+
+        print(tabulate(table, headers=headers, tablefmt="pretty"))
+
+        submitted = [account_result.result[1] for account_result in results if account_result.ok]
+        if submitted:
+            print(f"Last account submitted {max(submitted) * 1000:,.0f} ms after {fire_at}")
 
     def do_status(self, args):
         company_share_id = None
@@ -516,11 +588,9 @@ class NepseUtils(Cmd):
             try:
                 detailed_form = account.fetch_application_status(form_id=form_id)
             except LocalException as e:
-                account.logout()
                 status_table.append([account.name, "N/A", "N/A"])
                 continue
 
-            account.logout()
             status_table.append(
                 [
                     account.name,
@@ -538,6 +608,10 @@ class NepseUtils(Cmd):
             password = getpass(prompt="Enter new password for NepseUtils: ")
             self.ms.fernet = self.ms.fernet_init(password)
             self.ms.save_data()
+            self.ms.close()
+
+            # A running agent still holds the old key
+            MeroShare.lock_agent()
             print("Password changed successfully!")
             exit(0)
 
@@ -553,8 +627,8 @@ class NepseUtils(Cmd):
                 print("Pasting password on windows is not recommended!")
                 return
 
-            self.ms.accounts[int(account_id) - 1].password = new_password
-            self.ms.save_data()
+            account.password = new_password
+            self.ms.save_data(account)
 
     def help_loglevel(self):
         print("Set logging level")
@@ -574,10 +648,81 @@ class NepseUtils(Cmd):
         else:
             print("Invalid argument!")
 
-        self.ms.save_data()
+        self.ms.save_settings()
         print(f"Logging level set to {args}! Restart NepseUtils!")
         exit()
 
+    def help_cache(self):
+        print("Clear cached reference data like capitals and minimum units")
+        print("Usage: cache clear")
+
+    def do_cache(self, args):
+        if args != "clear":
+            print("Invalid argument!")
+            return
+
+        self.ms.metadata_cache.invalidate()
+        print("Cache cleared!")
+
+    def help_pool(self):
+        print("Set number of keep-alive connections kept open to MeroShare")
+        print("Usage: pool {size}")
+
+    def do_pool(self, args):
+        if not args.strip().isdigit() or int(args) < 1:
+            print("Invalid argument!")
+            return
+
+        self.ms.pool_size = int(args)
+        http.configure(self.ms.pool_size)
+        self.ms.save_settings()
+        print(f"Connection pool size set to {args}!")
+
+    def help_ratelimit(self):
+        print("Set maximum requests per second sent to MeroShare by all accounts, 0 to disable")
+        print("Usage: ratelimit {requests_per_second}")
+
+    def do_ratelimit(self, args):
+        try:
+            rate_limit = float(args)
+        except ValueError:
+            rate_limit = -1
+
+        if rate_limit < 0:
+            print("Invalid argument!")
+            return
+
+        self.ms.rate_limit = rate_limit
+        resilience.configure(rate_limit)
+        self.ms.save_settings()
+        print(f"Rate limit set to {args} requests per second!")
+
+    def help_profile(self):
+        print("Runs a command and writes its CPU, wall clock and network wait profile to a file")
+        print("Usage: profile {command}")
+
+    def do_profile(self, args):
+        import time
+
+        if not args.strip():
+            print("Invalid argument!")
+            return
+
+        command = args.split()[0]
+        filename = f"{command}-{time.strftime('%Y%m%d-%H%M%S')}.txt"
+        path = MeroShare.default_config_directory() / "profiles" / filename
+
+        def profiled():
+            # Saves are encrypted and written in background, include them in the profile.
+            # The inner command runs inside this command's batch, so write its changes now.
+            stop = self.onecmd(args)
+            self.ms.flush()
+            self.ms.wait_for_writes()
+            return stop
+
+        profiling.profile(profiled, path)
+        print(f"Profile written to {path}")
+
     def help_change(self):
         print("Options:")
         print("lock: Change nepseutils password")
@@ -607,12 +752,12 @@ class NepseUtils(Cmd):
 
             self.ms.telegram_bot_token = token
             self.ms.telegram_chat_id = chat_id
-            self.ms.save_data()
+            self.ms.save_settings()
 
         elif args == "disable":
             self.ms.telegram_bot_token = None
             self.ms.telegram_chat_id = None
-            self.ms.save_data()
+            self.ms.save_settings()
 
         else:
             print("Invalid argument!")
@@ -621,46 +766,52 @@ class NepseUtils(Cmd):
         self.do_clear(args)
 
     @staticmethod
-    def auto(password: str):
-        if not password:
-            print("Password not provided!")
+    def auto(
+        password: str | None,
+        workers: int = DEFAULT_WORKERS,
+        daemon: bool = False,
+        metrics_path: Path | None = None,
+    ):
+        if password:
+            ms: MeroShare = MeroShare.load(password)
+        elif MeroShare.agent_available() and (agent_ms := NepseUtils.load_from_agent()):
+            ms = agent_ms
+        else:
+            print("Password not provided and no unlock agent is running!")
             return
 
-        ms: MeroShare = MeroShare.load(password)
-
-        applicable_issues = ms.default_account.fetch_applicable_issues()
-
-        has_applicable = False
-        for issue in applicable_issues:
-            if (
-                issue.get("shareTypeName") == "IPO"
-                and issue.get("shareGroupName") == "Ordinary Shares"
-                and issue.get("subGroup") == "For General Public"
-            ):
-                has_applicable = True
-                share_id = issue.get("companyShareId")
-                try:
-                    min_unit = ms.default_account.find_min_apply_unit(share_id)
-                except Exception as _:
-                    min_unit = 10
-
-                for account in ms.accounts:
-                    try:
-                        account.apply(share_id=int(share_id), quantity=min_unit)
-                    except Exception as _:
-                        pass
-
-        if not has_applicable:
+        if daemon:
+            NepseUtils.run_daemon(ms, workers, metrics_path)
+        else:
+            with ms.batch():
+                NepseUtils.auto_apply(ms, workers)
+
+        ms.close()
+
+    @staticmethod
+    def auto_apply(ms: MeroShare, workers: int = DEFAULT_WORKERS):
+        from nepseutils.core.scheduler import Scheduler
+
+        scheduler = Scheduler(ms, workers)
+
+        if not scheduler.apply_matching(ms.issue_catalog.issues(refresh=True)):
             logging.info("No applicable issues found!")
 
-        ms.save_data()
+        scheduler.refresh_statuses()
+
+    @staticmethod
+    def run_daemon(ms: MeroShare, workers: int = DEFAULT_WORKERS, metrics_path: Path | None = None):
+        import signal
+
+        from nepseutils.core.scheduler import Scheduler
 
-        for account in ms.accounts:
-            account.fetch_applied_issues()
-            account.fetch_applied_issues_status()
+        scheduler = Scheduler(ms, workers, metrics_path)
+        signal.signal(signal.SIGTERM, lambda *_: scheduler.stop())
 
-        ms.save_data()
-        ms.logging_handler.shutdown()
+        try:
+            scheduler.run()
+        except KeyboardInterrupt:
+            scheduler.stop()
 
     def default(self, inp):
         if inp == "x" or inp == "q" or inp == "EOF":
@@ -669,18 +820,98 @@ class NepseUtils(Cmd):
         print('Invalid command! Type "help" for help')
 
 
+def run(func, profile_path: str | None):
+    if profile_path:
+        profiling.profile(func, Path(profile_path))
+        print(f"Profile written to {profile_path}")
+    else:
+        func()
+
+
 def main():
     parser = argparse.ArgumentParser(description="Nepse Utility CLI")
 
     parser.add_argument("--password", help="Password for auto_apply")
     parser.add_argument("--auto", action="store_true", help="Enable auto_apply mode")
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Keep running, polling for new issues to apply (implies --auto)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help="Number of accounts processed concurrently",
+    )
+
+    parser.add_argument(
+        "--metrics",
+        metavar="FILE",
+        help="Write request metrics to FILE on exit, and after every poll in daemon mode. "
+        "JSON if FILE ends with .json, Prometheus text otherwise",
+    )
+
+    parser.add_argument(
+        "--profile",
+        metavar="FILE",
+        help="Profile the whole run and write CPU, wall clock and network wait breakdown to FILE",
+    )
+
+    parser.add_argument(
+        "--trace",
+        metavar="FILE",
+        help="Append trace spans of every operation to FILE as JSON lines. "
+        "View with python -m nepseutils.utils.tracing FILE",
+    )
+
+    parser.add_argument("--agent", action="store_true", help="Start an unlock agent in background")
+    parser.add_argument(
+        "--lock-timeout",
+        type=float,
+        default=agent.DEFAULT_LOCK_TIMEOUT,
+        help="Seconds of inactivity after which the unlock agent locks itself",
+    )
+    parser.add_argument("--lock", action="store_true", help="Lock and stop the running unlock agent")
 
     args = parser.parse_args()
+    metrics_path = Path(args.metrics) if args.metrics else None
+
+    if args.trace:
+        tracing.configure(Path(args.trace))
+
+    if args.agent or args.lock:
+        if not agent.is_supported():
+            print("Unlock agent is not supported on this platform!")
+            return
+
+    if args.agent:
+        from cryptography.fernet import InvalidToken
 
-    if args.auto and args.password:
-        NepseUtils().auto(args.password)
+        password = args.password or getpass(prompt="Enter password to unlock: ")
+
+        try:
+            socket_path = MeroShare.start_agent(password, lock_timeout=args.lock_timeout)
+        except InvalidToken:
+            print("Incorrect password!")
+            return
+
+        print(f"Unlock agent started at {socket_path}")
+    elif args.lock:
+        MeroShare.lock_agent()
+        print("Unlock agent locked!")
+    elif args.auto or args.daemon:
+        run(
+            lambda: NepseUtils().auto(
+                args.password, workers=args.workers, daemon=args.daemon, metrics_path=metrics_path
+            ),
+            args.profile,
+        )
     else:
-        NepseUtils().cmdloop()
+        run(lambda: NepseUtils().cmdloop(), args.profile)
+
+    if metrics_path:
+        metrics.registry.write(metrics_path)
 
 
 if __name__ == "__main__":
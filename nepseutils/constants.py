@@ -1,6 +1,11 @@
+import os
+
 USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64; rv:142.0) Gecko/20100101 Firefox/142.0"
 
-MS_API_BASE = "https://webbackend.cdsc.com.np/api"
+# Both can be pointed at a local stand-in server, e.g. nepseutils.utils.fake_server
+MS_API_BASE = os.getenv("NEPSEUTILS_API_BASE", "https://webbackend.cdsc.com.np/api")
+RESULT_API_BASE = os.getenv("NEPSEUTILS_RESULT_API_BASE", "https://iporesult.cdsc.com.np")
+TELEGRAM_API_BASE = os.getenv("NEPSEUTILS_TELEGRAM_API_BASE", "https://api.telegram.org")
 
 BASE_HEADERS = {
     "User-Agent": USER_AGENT,
@@ -17,3 +22,66 @@ BASE_HEADERS = {
     "Pragma": "no-cache",
     "Cache-Control": "no-cache",
 }
+
+# Number of accounts processed concurrently by bulk operations like sync
+DEFAULT_WORKERS = 8
+
+# Maximum keep-alive connections kept open per host by the shared HTTP session
+DEFAULT_POOL_SIZE = 16
+
+# Cached auth tokens are discarded after this many seconds without use, or since login
+TOKEN_IDLE_TIMEOUT = 10 * 60
+TOKEN_MAX_AGE = 60 * 60
+
+# Applicable issue list fetched once is shared by all accounts for this many seconds
+APPLICABLE_ISSUE_TTL = 60
+
+# Reference data is served from the on disk metadata cache for this many seconds
+CAPITAL_LIST_TTL = 7 * 24 * 60 * 60
+MIN_APPLY_UNIT_TTL = 24 * 60 * 60
+
+# Application reports are fetched in pages of this size. Incremental syncs, which stop at
+# the newest locally known form, use the smaller page since they rarely need more.
+REPORT_PAGE_SIZE = 200
+INCREMENTAL_REPORT_PAGE_SIZE = 10
+
+# Failed requests are retried with exponential backoff and full jitter, waiting a random
+# time of up to RETRY_BACKOFF * 2^attempt seconds, capped at RETRY_MAX_WAIT
+RETRY_ATTEMPTS = 3
+RETRY_BACKOFF = 1
+RETRY_MAX_WAIT = 30
+
+# An endpoint failing this many times in a row is not called again for CIRCUIT_RESET_TIMEOUT
+# seconds, by any account
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_RESET_TIMEOUT = 30
+
+# Requests per second shared by all accounts, allowing bursts of twice as many
+RATE_LIMIT = 20
+
+# Armed applications renew tokens this many seconds before firing, and fire from up to
+# ARM_WORKERS threads waiting in parallel
+ARM_TOKEN_REFRESH_LEAD = 60
+ARM_WORKERS = 32
+
+# Scheduler daemon polls applicable issues every SCHEDULER_MARKET_INTERVAL seconds while
+# issues can be applied for (Nepal time), every SCHEDULER_CLOSING_INTERVAL seconds if an
+# unapplied issue closes within SCHEDULER_CLOSING_WINDOW and every SCHEDULER_IDLE_INTERVAL
+# seconds otherwise. Allotment status is refreshed every SCHEDULER_STATUS_INTERVAL seconds.
+SCHEDULER_MARKET_HOURS = (10, 17)
+SCHEDULER_MARKET_INTERVAL = 2 * 60
+SCHEDULER_CLOSING_INTERVAL = 30
+SCHEDULER_CLOSING_WINDOW = 2 * 60 * 60
+SCHEDULER_IDLE_INTERVAL = 30 * 60
+SCHEDULER_STATUS_INTERVAL = 60 * 60
+
+# Telegram rejects messages longer than TELEGRAM_MESSAGE_LIMIT characters and throttles
+# chats sent more than about one message per second. Log records are batched for up to
+# TELEGRAM_BATCH_DELAY seconds, and logging blocks for up to TELEGRAM_ENQUEUE_TIMEOUT seconds
+# once TELEGRAM_QUEUE_SIZE records are waiting to be sent.
+TELEGRAM_MESSAGE_LIMIT = 4096
+TELEGRAM_RATE_LIMIT = 1
+TELEGRAM_BATCH_DELAY = 0.5
+TELEGRAM_QUEUE_SIZE = 1000
+TELEGRAM_ENQUEUE_TIMEOUT = 1
+TELEGRAM_SHUTDOWN_TIMEOUT = 10
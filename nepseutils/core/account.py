@@ -1,43 +1,81 @@
 import logging
-from collections.abc import Callable
-
-import requests
-from tenacity import retry
-from tenacity.retry import retry_if_exception_type
-from tenacity.stop import stop_after_attempt
-from tenacity.wait import wait_fixed
-
-from nepseutils.constants import BASE_HEADERS, MS_API_BASE
+import time
+from collections.abc import Callable, Iterator
+from typing import TYPE_CHECKING
+
+from nepseutils.constants import (
+    INCREMENTAL_REPORT_PAGE_SIZE,
+    REPORT_PAGE_SIZE,
+    TOKEN_IDLE_TIMEOUT,
+    TOKEN_MAX_AGE,
+)
+from nepseutils.utils import http, resilience
 from nepseutils.utils.decorators import autosave, login_required
+from nepseutils.utils.resilience import network_retry, submit_retry
+from nepseutils.utils.tracing import traced
 
-from .errors import GlobalError, LocalException
-from .issue import Issue
+from .errors import GlobalError, LocalException, TokenExpired
+from .issue import Issue, IssueStore
 from .portfolio import Portfolio, PortfolioEntry
 
+if TYPE_CHECKING:
+    from requests import Response
+
 
 class Account:
+    __slots__ = (
+        "dmat",
+        "password",
+        "pin",
+        "crn",
+        "username",
+        "name",
+        "dpid",
+        "account",
+        "capital_id",
+        "branch_id",
+        "customer_id",
+        "bank_id",
+        "account_type_id",
+        "auth_token",
+        "token_issued_at",
+        "token_last_used",
+        "portfolio",
+        "issues",
+        "last_applicant_form_id",
+        "migrated_history_imported",
+        "tag",
+        "save",
+        "send_telegram_message",
+    )
+
     dmat: str
     password: str
     pin: int
     crn: str | None
-    username: int | None = None
-    name: str | None = None
-    dpid: str | None = None
-    account: str | None = None
-    capital_id: int | None = None
-    branch_id: str | None = None
-    customer_id: str | None = None
-    bank_id: str | None = None
-    account_type_id: str | None = None
-
-    auth_token: str | None = None
+    username: int | None
+    name: str | None
+    dpid: str | None
+    account: str | None
+    capital_id: int | None
+    branch_id: str | None
+    customer_id: str | None
+    bank_id: str | None
+    account_type_id: str | None
+
+    auth_token: str | None
+    token_issued_at: float | None
+    token_last_used: float | None
 
     portfolio: Portfolio
-    issues: list[Issue]
+    issues: IssueStore
+    last_applicant_form_id: int | None
+    migrated_history_imported: bool
 
     tag: str | None
 
-    save: Callable = lambda: None
+    save: Callable
+    send_telegram_message: Callable
 
     def __init__(
         self,
@@ -55,10 +93,14 @@ class Account:
         bank_id: str | None = None,
         account_type_id: str | None = None,
         portfolio: Portfolio | None = None,
-        issues: list[Issue] | None = None,
+        issues: list[Issue] | IssueStore | None = None,
+        last_applicant_form_id: int | None = None,
+        migrated_history_imported: bool = False,
         tag: str | None = None,
         save: Callable | None = None,
-        __auth_token: str | None = None,
+        auth_token: str | None = None,
+        token_issued_at: float | None = None,
+        token_last_used: float | None = None,
         send_telegram_message: Callable = lambda *args, **kwargs: None,
     ):
         self.send_telegram_message = send_telegram_message
@@ -74,19 +116,20 @@ class Account:
         self.branch_id = branch_id
         self.customer_id = customer_id
         self.bank_id = bank_id
+        self.account_type_id = account_type_id
 
         self.portfolio = portfolio or Portfolio([], 0, 0, 0)
-        self.issues = issues or []
+        self.issues = issues if isinstance(issues, IssueStore) else IssueStore(issues)
+        self.last_applicant_form_id = last_applicant_form_id
+        self.migrated_history_imported = migrated_history_imported
 
         self.tag = tag
 
-        if save:
-            self.save = save
-
-        self.__session = requests.Session()
-        self.__session.headers.update(BASE_HEADERS)
+        self.save = save or (lambda: None)
 
-        self.auth_token = __auth_token
+        self.auth_token = auth_token
+        self.token_issued_at = token_issued_at
+        self.token_last_used = token_last_used
 
         if not self.dpid:
             self.dpid = dmat[3:8]
@@ -94,12 +137,47 @@ class Account:
         if not self.username:
             self.username = int(dmat[-8:])
 
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_fixed(2),
-        reraise=True,
-        retry=retry_if_exception_type(LocalException),
-    )
+    def _request(self, method: str, endpoint: str, **kwargs) -> "Response":
+        """
+        Sends a request to MeroShare API through the shared keep-alive session, rate limiter
+        and circuit breaker. Authorization header of this account is attached to every request.
+        """
+        headers = {"Authorization": self.auth_token or "null"}
+        headers.update(kwargs.pop("headers", None) or {})
+
+        response = resilience.send(
+            method, http.api_url(endpoint), account=self.name or self.dmat, headers=headers, **kwargs
+        )
+
+        if self.auth_token and headers["Authorization"] == self.auth_token:
+            if response.status_code == 401:
+                logging.info("Auth token rejected for user: %s", self.name)
+                self.auth_token = None
+                raise TokenExpired(f"Auth token expired for user: {self.name}!")
+
+            self.token_last_used = time.time()
+
+        return response
+
+    @property
+    def token_expired(self) -> bool:
+        return time.time() > self.token_valid_until
+
+    @property
+    def token_valid_until(self) -> float:
+        """
+        Time the cached token is considered expired at if it is not used before then.
+        """
+        if not self.auth_token or self.token_issued_at is None:
+            return 0
+
+        return min(
+            self.token_issued_at + TOKEN_MAX_AGE,
+            (self.token_last_used or self.token_issued_at) + TOKEN_IDLE_TIMEOUT,
+        )
+
+    @traced
+    @network_retry
     def login(self) -> str:
         assert self.username and self.password and self.dpid, "Username, password and DPID required!"
 
@@ -109,55 +187,50 @@ class Account:
             "password": self.password,
         }
 
-        headers = BASE_HEADERS.copy()
-        headers["Authorization"] = "null"
-        headers["Content-Type"] = "application/json"
-
-        login_req = requests.post(f"{MS_API_BASE}/meroShare/auth/", json=data, headers=headers)
+        login_req = self._request("POST", "meroShare/auth/", json=data, headers={"Authorization": "null"})
 
         response_data = login_req.json()
 
         if login_req.status_code != 200:
             logging.error(
-                f"Login failed for user: {self.name}! \n Status: {login_req.status_code} \n {response_data}"
+                "Login failed for user: %s! \n Status: %s \n %s",
+                self.name,
+                login_req.status_code,
+                response_data,
             )
             raise LocalException(f"Login failed for user: {self.name}!")
 
         if response_data.get("passwordExpired"):
-            logging.error(f"Password has expired for user: {self.name}")
+            logging.error("Password has expired for user: %s", self.name)
             raise LocalException(f"Password has expired for user: {self.name}")
 
         if response_data.get("accountExpired"):
-            logging.error(f"Account has expired for user: {self.name}")
+            logging.error("Account has expired for user: %s", self.name)
             raise LocalException(f"Account has expired for user: {self.name}")
 
         if response_data.get("dematExpired"):
-            logging.error(f"DMAT has expired for user: {self.name}")
+            logging.error("DMAT has expired for user: %s", self.name)
             raise LocalException(f"DMAT has expired for user: {self.name}")
 
         self.auth_token = login_req.headers.get("Authorization")
-        self.__session.headers.update({"Authorization": self.auth_token})  # type: ignore
+        self.token_issued_at = self.token_last_used = time.time()
 
         return self.auth_token  # type: ignore
 
+    @traced
     @login_required
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_fixed(2),
-        reraise=True,
-        retry=retry_if_exception_type(LocalException),
-    )
+    @network_retry
     def get_details(self) -> dict:
-        logging.info(f"Getting details for user: {self.name}")
-        headers = BASE_HEADERS.copy()
-        headers["Authorization"] = self.auth_token
-        
+        logging.info("Getting details for user: %s", self.name)
+
         if (not self.account) or (not self.name):
-            account_details = requests.get(f"{MS_API_BASE}/meroShareView/myDetail/{self.dmat}", headers=headers)
+            account_details = self._request("GET", f"meroShareView/myDetail/{self.dmat}")
 
             if account_details.status_code != 200:
                 logging.warning(
-                    f"Failed to get account details!\n Status: {account_details.status_code}\n {account_details.json()}"
+                    "Failed to get account details!\n Status: %s\n %s",
+                    account_details.status_code,
+                    account_details.json(),
                 )
                 raise LocalException(f"Failed to get account details for user: {self.name}!")
 
@@ -168,11 +241,11 @@ class Account:
 
             if not self.account:
                 bank_code = account_details.get("bankCode")
-                bank_req = requests.get(f"{MS_API_BASE}/bankRequest/{bank_code}", headers=headers)
+                bank_req = self._request("GET", f"bankRequest/{bank_code}")
 
                 if bank_req.status_code != 200:
                     logging.warning(
-                        f"Failed to get bank details!\n Status: {bank_req.status_code}\n {bank_req.json()}"
+                        "Failed to get bank details!\n Status: %s\n %s", bank_req.status_code, bank_req.json()
                     )
                     raise LocalException(f"Failed to get bank details for user: {self.name}!")
 
@@ -181,14 +254,14 @@ class Account:
                 self.account = bank_req.get("accountNumber")
 
         if not self.bank_id:
-            bank_req = requests.get(
-                f"{MS_API_BASE}/meroShare/bank/",
-                headers=headers
-            )
+            bank_req = self._request("GET", "meroShare/bank/")
 
             if bank_req.status_code != 200:
                 logging.warning(
-                    f"Failed to get bank details for account {self.name}!\n Status: {bank_req.status_code}\n {bank_req.json()}"
+                    "Failed to get bank details for account %s!\n Status: %s\n %s",
+                    self.name,
+                    bank_req.status_code,
+                    bank_req.json(),
                 )
                 raise LocalException(f"Failed to get bank details for user: {self.name}!")
 
@@ -197,11 +270,14 @@ class Account:
             self.bank_id = bank_req[0].get("id")
 
         if (not self.branch_id) or (not self.customer_id) or (not self.account_type_id):
-            bank_specific_req = requests.get(f"{MS_API_BASE}/meroShare/bank/{self.bank_id}", headers=headers)
+            bank_specific_req = self._request("GET", f"meroShare/bank/{self.bank_id}")
 
             if bank_specific_req.status_code != 200:
                 logging.warning(
-                    f"Failed to get bank specific details for account {self.name}!\n Status: {bank_specific_req.status_code}\n {bank_specific_req.json()}"
+                    "Failed to get bank specific details for account %s!\n Status: %s\n %s",
+                    self.name,
+                    bank_specific_req.status_code,
+                    bank_specific_req.json(),
                 )
                 raise LocalException(f"Failed to get bank specific details for user: {self.name}!")
 
@@ -231,40 +307,34 @@ class Account:
             "capital_id": self.capital_id,
         }
 
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_fixed(2),
-        reraise=True,
-        retry=retry_if_exception_type(LocalException),
-    )
+    @traced
+    @network_retry
     def logout(self) -> bool:
         if not self.auth_token:
             return True
 
-        headers = BASE_HEADERS.copy()
-        headers["Authorization"] = self.auth_token
-        logout_req = requests.get(
-            f"{MS_API_BASE}/meroShare/auth/logout/",
-            headers=headers
-        )
+        try:
+            logout_req = self._request("GET", "meroShare/auth/logout/")
+        except TokenExpired:
+            return True
 
         if logout_req.status_code != 201:
             logging.warning(
-                f"Logout failed for user : {self.name}\n Status: {logout_req.status_code}\n {logout_req.content}"
+                "Logout failed for user : %s\n Status: %s\n %s",
+                self.name,
+                logout_req.status_code,
+                logout_req.content,
             )
             raise LocalException(f"Logout failed for user: {self.name}!")
 
         self.auth_token = None
+        self.token_issued_at = self.token_last_used = None
         return True
 
+    @traced
     @autosave
     @login_required
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_fixed(2),
-        reraise=True,
-        retry=retry_if_exception_type(LocalException),
-    )
+    @network_retry
     def fetch_applicable_issues(self) -> list:
         data = {
             "filterFieldParams": [
@@ -301,39 +371,23 @@ class Account:
             ],
         }
 
-        headers = BASE_HEADERS.copy()
-        headers["Authorization"] = self.auth_token
-        headers["Content-Type"] = "application/json"
-
-        logging.info(f"Fetching applicable issues for user: {self.name}")
+        logging.info("Fetching applicable issues for user: %s", self.name)
 
-        issue_req = requests.post(
-            f"{MS_API_BASE}/meroShare/companyShare/applicableIssue/",
-            headers=headers,
-            json=data,
-        )
+        issue_req = self._request("POST", "meroShare/companyShare/applicableIssue/", json=data)
 
         if issue_req.status_code != 200:
             logging.warning(
-                f"Applicable issues request failed for user: {self.name}\n {issue_req.content}"
+                "Applicable issues request failed for user: %s\n %s", self.name, issue_req.content
             )
             raise LocalException(f"Applicable issues request failed for user: {self.name}!")
 
         return issue_req.json().get("object")
 
+    @traced
     @autosave
     @login_required
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_fixed(2),
-        reraise=True,
-        retry=retry_if_exception_type(LocalException),
-    )
-    def fetch_application_reports(self, active=True) -> list:
-        headers = BASE_HEADERS.copy()
-        headers["Authorization"] = self.auth_token
-        headers["Content-Type"] = "application/json"
-
+    @network_retry
+    def fetch_application_report_page(self, active=True, page: int = 1, size: int | None = None) -> list:
         if active:
             search_role_view_constants = "VIEW_APPLICANT_FORM_COMPLETE"
             endpoint = "meroShare/applicantForm/active/search/"
@@ -352,8 +406,8 @@ class Account:
                     "alias": "Company Name",
                 },
             ],
-            "page": 1,
-            "size": 200,
+            "page": page,
+            "size": size or REPORT_PAGE_SIZE,
             "searchRoleViewConstants": search_role_view_constants,
             "filterDateParams": [
                 {
@@ -371,42 +425,74 @@ class Account:
             ],
         }
 
-        logging.info(f"Fetching application reports for user: {self.name}")
-        recent_applied_req = requests.post(
-            f"{MS_API_BASE}/{endpoint}",
-            json=data,
-            headers=headers
-        )
+        logging.info("Fetching application reports page %s for user: %s", page, self.name)
+        recent_applied_req = self._request("POST", endpoint, json=data)
 
         if recent_applied_req.status_code != 200:
             logging.warning(
-                f"Recent application list request failed for user: {self.name}\n {recent_applied_req.content}"
+                "Recent application list request failed for user: %s\n %s",
+                self.name,
+                recent_applied_req.content,
             )
             raise LocalException(f"Recent application list request failed for user: {self.name}!")
 
-        return recent_applied_req.json().get("object")
+        return recent_applied_req.json().get("object") or []
+
+    def iter_application_reports(
+        self,
+        active=True,
+        since: int | None = None,
+        size: int | None = None,
+    ) -> Iterator[dict]:
+        """
+        Yields application reports newest first, fetching pages only as they are consumed.
+        With `since`, stops at the first report whose applicant form ID is not newer than it.
+        """
+        size = size or REPORT_PAGE_SIZE
+        page = 1
+
+        while True:
+            reports = self.fetch_application_report_page(active, page, size)
+
+            for report in reports:
+                if since is not None and int(report.get("applicantFormId") or 0) <= since:
+                    return
+
+                yield report
+
+            if len(reports) < size:
+                return
 
+            page += 1
+
+    def fetch_application_reports(self, active=True) -> list:
+        return list(self.iter_application_reports(active))
+
+    @traced
     @autosave
-    @login_required
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_fixed(2),
-        reraise=True,
-        retry=retry_if_exception_type(LocalException),
-    )
     def fetch_applied_issues(self, refetch=False) -> None:
-        application_reports = self.fetch_application_reports()
-
+        """
+        Adds newly applied issues. Only reports newer than the last known applicant form ID
+        are fetched and migrated history is imported once, unless `refetch` is set, which
+        rebuilds the history from scratch.
+        """
         if refetch:
-            self.issues = []
+            self.issues = IssueStore()
+            self.last_applicant_form_id = None
+            self.migrated_history_imported = False
 
-        existing_issues = [issue.symbol for issue in self.issues]
+        if self.last_applicant_form_id is None:
+            application_reports = self.iter_application_reports()
+        else:
+            application_reports = self.iter_application_reports(
+                since=self.last_applicant_form_id, size=INCREMENTAL_REPORT_PAGE_SIZE
+            )
 
-        for report in application_reports:
-            if report.get("scrip") in existing_issues:
-                continue
+        # Only advanced once every new report is stored, so a failed page is fetched again next time
+        last_applicant_form_id = self.last_applicant_form_id
 
-            self.issues.append(
+        for report in application_reports:
+            self.issues.upsert(
                 Issue(
                     name=report.get("companyName"),
                     symbol=report.get("scrip"),
@@ -418,20 +504,28 @@ class Account:
                 )
             )
 
-        application_reports = self.fetch_application_reports(active=False)
+            applicant_form_id = int(report.get("applicantFormId") or 0)
+            if applicant_form_id > (last_applicant_form_id or 0):
+                last_applicant_form_id = applicant_form_id
 
-        for report in application_reports:
-            found = False
+        self.last_applicant_form_id = last_applicant_form_id
 
+        if not self.migrated_history_imported:
+            self.import_migrated_issues()
+
+    @traced
+    def import_migrated_issues(self) -> None:
+        """
+        Imports the migrated application archive. It never changes, so this runs once per
+        account and again only when the history is refetched.
+        """
+        for report in self.iter_application_reports(active=False):
             # Skip if already exists and mark as old
-            for issue in self.issues:
-                if issue.symbol == report.get("scrip"):
-                    if issue.old == False:
-                        issue.old = True
-                    found = True
-                    break
+            issue = self.issues.by_symbol(report.get("scrip"))
 
-            if found:
+            if issue:
+                if issue.old == False:
+                    issue.old = True
                 continue
 
             self.issues.append(
@@ -446,22 +540,16 @@ class Account:
                 )
             )
 
-        self.save()
+        self.migrated_history_imported = True
 
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_fixed(2),
-        reraise=True,
-        retry=retry_if_exception_type(LocalException),
-    )
+    @traced
+    @login_required
+    @network_retry
     def fetch_applied_issues_status(self, company_id: str | None = None) -> None:
         if company_id is None:
-            issues = self.issues
+            issues = list(self.issues)
         else:
-            issues = [issue for issue in self.issues if issue.company_share_id == company_id]
-
-        headers = BASE_HEADERS.copy()
-        headers["Authorization"] = self.auth_token
+            issues = self.issues.all_by_company_share_id(company_id)
 
         for issue in issues:
             # Skip if allotion status already fetched
@@ -469,23 +557,25 @@ class Account:
                 continue
 
             if not issue.old:
-                logging.info(f"Fetching application status of issue {issue.symbol} for user: {self.name}")
-                details_req = requests.get(
-                    f"{MS_API_BASE}/meroShare/applicantForm/report/detail/{issue.applicant_form_id}",
-                    headers=headers
+                logging.info("Fetching application status of issue %s for user: %s", issue.symbol, self.name)
+                details_req = self._request(
+                    "GET", f"meroShare/applicantForm/report/detail/{issue.applicant_form_id}"
                 )
             else:
                 logging.info(
-                    f"Fetching application status of issue {issue.symbol} (old) for user: {self.name}"
+                    "Fetching application status of issue %s (old) for user: %s", issue.symbol, self.name
                 )
-                details_req = requests.get(
-                    f"{MS_API_BASE}/meroShare/migrated/applicantForm/report/{issue.applicant_form_id}",
-                    headers=headers
+                details_req = self._request(
+                    "GET", f"meroShare/migrated/applicantForm/report/{issue.applicant_form_id}"
                 )
 
             if details_req.status_code != 200:
                 logging.warning(
-                    f"Failed to fetch application status of issue {issue.symbol} for user: {self.name}\n {details_req.content} \n {MS_API_BASE}/migrated/applicantForm/report/{issue.applicant_form_id}"
+                    "Failed to fetch application status of issue %s for user: %s\n %s \n %s",
+                    issue.symbol,
+                    self.name,
+                    details_req.content,
+                    details_req.url,
                 )
                 continue
 
@@ -493,17 +583,17 @@ class Account:
 
             if details.get("statusName") == "Alloted":
                 logging.info(
-                    f"Application status of issue {issue.symbol} is ALLOTED for user: {self.name}"
+                    "Application status of issue %s is ALLOTED for user: %s", issue.symbol, self.name
                 )
                 issue.alloted = True
             elif details.get("statusName") == "Not Alloted":
                 logging.info(
-                    f"Application status of issue {issue.symbol} is NOT Alloted for user: {self.name}"
+                    "Application status of issue %s is NOT Alloted for user: %s", issue.symbol, self.name
                 )
                 issue.alloted = False
             elif details.get("statusName") == "Rejected":
-                logging.warn(
-                    f"Application status of issue {issue.symbol} is REJECTED for user: {self.name}"
+                logging.warning(
+                    "Application status of issue %s is REJECTED for user: %s", issue.symbol, self.name
                 )
                 issue.alloted = False
             else:
@@ -517,41 +607,27 @@ class Account:
             issue.block_amount_status = details.get("meroshareRemark")
             self.save()
 
+    @traced
     @login_required
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_fixed(2),
-        reraise=True,
-        retry=retry_if_exception_type(LocalException),
-    )
+    @network_retry
     def fetch_application_status(self, form_id: int | None = None, share_id: int | None = None) -> dict:
         if not form_id:
-            recent_applied_response_json = self.fetch_application_reports()
-
-            target_issue = None
-
-            for issue in recent_applied_response_json:
-                if issue.get("companyShareId") == share_id:
-                    target_issue = issue
-                    form_id = target_issue.get("applicantFormId")
+            for report in self.iter_application_reports():
+                if report.get("companyShareId") == share_id:
+                    form_id = report.get("applicantFormId")
                     break
 
         if not form_id:
             logging.critical(
-                f"No issue with provided id found in recent application history for user: {self.name}"
+                "No issue with provided id found in recent application history for user: %s", self.name
             )
             raise LocalException("Issue not found!")
 
-        headers = BASE_HEADERS.copy()
-        headers["Authorization"] = self.auth_token
-        details_req = requests.get(
-            f"{MS_API_BASE}/meroShare/applicantForm/report/detail/{form_id}",
-            headers=headers
-        )
+        details_req = self._request("GET", f"meroShare/applicantForm/report/detail/{form_id}")
 
         if details_req.status_code != 200:
             logging.warning(
-                f"Application status request failed for user: {self.name}\n {details_req.content}"
+                "Application status request failed for user: %s\n %s", self.name, details_req.content
             )
             raise LocalException(f"Application status request failed for user: {self.name}!")
 
@@ -559,20 +635,13 @@ class Account:
 
         return details_response_json
 
+    @traced
     @login_required
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_fixed(2),
-        reraise=True,
-        retry=retry_if_exception_type(LocalException),
-    )
+    @network_retry
     def fetch_portfolio(self) -> Portfolio:
-        headers = BASE_HEADERS.copy()
-        headers["Authorization"] = self.auth_token
-        headers["Content-Type"] = "application/json"
-        
-        portfolio_req = requests.post(
-            f"{MS_API_BASE}/meroShareView/myPortfolio/",
+        portfolio_req = self._request(
+            "POST",
+            "meroShareView/myPortfolio/",
             json={
                 "sortBy": "script",
                 "demat": [self.dmat],
@@ -581,11 +650,10 @@ class Account:
                 "size": 200,
                 "sortAsc": True,
             },
-            headers=headers
         )
 
         if portfolio_req.status_code != 200:
-            logging.warning(f"Portfolio request failed for user: {self.name}\n {portfolio_req.content}")
+            logging.warning("Portfolio request failed for user: %s\n %s", self.name, portfolio_req.content)
             raise LocalException(f"Portfolio request failed for user: {self.name}!")
 
         portfolio_response_json = portfolio_req.json()
@@ -619,24 +687,15 @@ class Account:
         self.portfolio = new_portfolio
         return new_portfolio
 
+    @traced
     @login_required
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_fixed(2),
-        reraise=True,
-        retry=retry_if_exception_type(LocalException),
-    )
+    @network_retry
     def find_min_apply_unit(self, company_share_id) -> int:
-        headers = BASE_HEADERS.copy()
-        headers["Authorization"] = self.auth_token
-        min_apply_unit_req = requests.get(
-            f"{MS_API_BASE}/meroShare/active/{company_share_id}",
-            headers=headers
-        )
+        min_apply_unit_req = self._request("GET", f"meroShare/active/{company_share_id}")
 
         if min_apply_unit_req.status_code != 200:
             logging.warning(
-                f"Min apply unit request failed for user: {self.name}\n {min_apply_unit_req.content}"
+                "Min apply unit request failed for user: %s\n %s", self.name, min_apply_unit_req.content
             )
             raise LocalException(f"Min apply unit request failed for user: {self.name}!")
 
@@ -644,13 +703,9 @@ class Account:
 
         return int(min_apply_unit_response_json.get("minUnit"))
 
+    @traced
     @login_required
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_fixed(2),
-        reraise=True,
-        retry=retry_if_exception_type(LocalException),
-    )
+    @network_retry
     def fetch_edis_history(self):
         data = {
             "filterFieldParams": [
@@ -704,19 +759,13 @@ class Account:
             ],
         }
 
-        headers = BASE_HEADERS.copy()
-        headers["Authorization"] = self.auth_token
-        headers["Content-Type"] = "application/json"
-        
-        details_response = requests.post(
-            f"{MS_API_BASE}/EDIS/report/search/",
-            json=data,
-            headers=headers
-        )
+        details_response = self._request("POST", "EDIS/report/search/", json=data)
 
         if details_response.status_code != 200:
             logging.warning(
-                f"Apply failed! Status code: {details_response.status_code}, Message: {details_response.content}"
+                "Apply failed! Status code: %s, Message: %s",
+                details_response.status_code,
+                details_response.content,
             )
             raise LocalException(f"Apply failed for user {self.name}!")
 
@@ -724,18 +773,75 @@ class Account:
 
         for item in details_json.get("object"):
             logging.info(
-                f"Script: {item.get('contract').get('obligation').get('scriptCode')}, Status: {item.get('statusName')}, for account: {self.name}"
+                "Script: %s, Status: %s, for account: %s",
+                item.get("contract").get("obligation").get("scriptCode"),
+                item.get("statusName"),
+                self.name,
             )
 
         return details_json.get("object")
 
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_fixed(2),
-        reraise=True,
-        retry=retry_if_exception_type(LocalException),
-    )
-    def apply(self, share_id: int, quantity: int) -> dict:
+    @traced
+    @login_required
+    def apply(self, share_id: int, quantity: int, issue: dict | None = None) -> dict:
+        """
+        Applies for `share_id`. If `issue` from a shared catalog is given, the per account
+        applicable issue request is skipped and already applied issues are detected from
+        locally known applications instead.
+        """
+        self.ensure_details()
+
+        assert share_id and quantity, "Share ID and quantity must be provided!"
+
+        issue_to_apply = issue
+
+        logging.info("Applying %s units of %s for user: %s", quantity, share_id, self.name)
+
+        if issue_to_apply is None:
+            issue_to_apply = self.find_applicable_issue(share_id)
+        elif self.issues.by_company_share_id(share_id):
+            issue_to_apply = {**issue_to_apply, "action": "edit"}
+
+        if not issue_to_apply:
+            logging.warning("Provided ID doesn't match any of the applicable issues!")
+            raise GlobalError("No matching applicable issues!")
+
+        if issue_to_apply.get("action"):
+            logging.warning("Issue already applied! %s for user: %s", issue_to_apply, self.name)
+            return {"status": "CREATED", "message": "Issue already applied!"}
+
+        try:
+            response = self.submit_apply(self.apply_payload(share_id, quantity))
+        except LocalException:
+            # Local history may be stale, check once whether it was applied from elsewhere
+            if issue is not None and (self.find_applicable_issue(share_id) or {}).get("action"):
+                logging.warning("Issue already applied! %s for user: %s", share_id, self.name)
+                return {"status": "CREATED", "message": "Issue already applied!"}
+
+            raise
+
+        # The application was accepted, failing to refresh history must not fail or resend it
+        try:
+            self.fetch_applied_issues()
+        except Exception as e:
+            logging.warning("Failed to refresh applied issues after applying for user: %s: %s", self.name, e)
+
+        return response
+
+    def find_applicable_issue(self, share_id: int) -> dict | None:
+        """
+        Returns `share_id` from the issues applicable to this account, including its `action`.
+        """
+        for applicable_issue in self.fetch_applicable_issues():
+            if applicable_issue.get("companyShareId") == share_id:
+                return applicable_issue
+
+        return None
+
+    def ensure_details(self) -> None:
+        """
+        Fetches account details needed to apply if any of them is missing.
+        """
         if not (
             self.dmat
             and self.account
@@ -749,36 +855,8 @@ class Account:
             self.get_details()
             self.save()
 
-        assert share_id and quantity, "Share ID and quantity must be provided!"
-
-        issue_to_apply = None
-
-        logging.info(f"Applying {quantity} units of {share_id} for user: {self.name}")
-
-        applicable_issue = self.fetch_applicable_issues()
-
-        for issue in applicable_issue:
-            if issue.get("companyShareId") == share_id:
-                issue_to_apply = issue
-
-        if not issue_to_apply:
-            logging.warning("Provided ID doesn't match any of the applicable issues!")
-            raise GlobalError("No matching applicable issues!")
-
-        if issue_to_apply.get("action"):
-            logging.warning(f"Issue already applied! {issue_to_apply} for user: {self.name}")
-            return {
-                "status": "CREATED",
-                "message": "Issue already applied!",
-            }
-
-        headers = BASE_HEADERS.copy()
-        headers["Authorization"] = self.auth_token
-        headers["Content-Type"] = "application/json"
-        headers["Pragma"] = "no-cache"
-        headers["Cache-Control"] = "no-cache"
-
-        data = {
+    def apply_payload(self, share_id: int, quantity: int) -> dict:
+        return {
             "demat": self.dmat,
             "boid": self.dmat[-8:],
             "accountNumber": self.account,
@@ -792,22 +870,39 @@ class Account:
             "bankId": self.bank_id,
         }
 
-        apply_req = requests.post(
-            f"{MS_API_BASE}/meroShare/applicantForm/share/apply",
-            json=data,
-            headers=headers
-        )
+    @traced
+    @login_required
+    def prepare_apply(self, share_id: int, quantity: int) -> dict:
+        """
+        Does everything `apply` needs before the issue opens: logs in, fills in missing
+        details and builds the payload for `submit_apply`.
+        """
+        assert share_id and quantity, "Share ID and quantity must be provided!"
+
+        self.ensure_details()
+        return self.apply_payload(share_id, quantity)
+
+    @traced
+    @login_required
+    @submit_retry
+    def submit_apply(self, payload: dict) -> dict:
+        """
+        Posts a payload built by `prepare_apply`, without checking applicable issues first.
+        """
+        apply_req = self._request("POST", "meroShare/applicantForm/share/apply", json=payload)
 
         if apply_req.status_code != 201:
             logging.warning(
-                f"Apply failed! Status code: {apply_req.status_code}, Message: {apply_req.content}"
+                "Apply failed! Status code: %s, Message: %s", apply_req.status_code, apply_req.content
             )
             raise LocalException(f"Apply failed for user {self.name}!")
 
-        logging.info(f"Applied {quantity} kitta of {issue_to_apply.get('companyName')} for {self.name}!")
-
-        self.fetch_applied_issues()
-
+        logging.info(
+            "Applied %s kitta of %s for %s!",
+            payload.get("appliedKitta"),
+            payload.get("companyShareId"),
+            self.name,
+        )
         return apply_req.json()
 
     def to_json(self):
@@ -826,8 +921,13 @@ class Account:
             "bank_id": self.bank_id,
             "account_type_id": self.account_type_id,
             "portfolio": self.portfolio.to_json(),
-            "issues": [issue.to_json() for issue in self.issues or []],
+            "issues": self.issues.to_json(),
+            "last_applicant_form_id": self.last_applicant_form_id,
+            "migrated_history_imported": self.migrated_history_imported,
             "tag": self.tag,
+            "auth_token": self.auth_token,
+            "token_issued_at": self.token_issued_at,
+            "token_last_used": self.token_last_used,
         }
 
     @staticmethod
@@ -849,5 +949,10 @@ class Account:
             account_type_id=json.get("account_type_id"),
             portfolio=Portfolio.from_json(json.get("portfolio") or {}),
             issues=[Issue.from_json(issue) for issue in json.get("issues") or []],
+            last_applicant_form_id=json.get("last_applicant_form_id"),
+            migrated_history_imported=bool(json.get("migrated_history_imported")),
             tag=json.get("tag"),
+            auth_token=json.get("auth_token"),
+            token_issued_at=json.get("token_issued_at"),
+            token_last_used=json.get("token_last_used"),
         )
@@ -0,0 +1,49 @@
+import logging
+import threading
+import time
+from collections.abc import Callable
+
+from nepseutils.constants import APPLICABLE_ISSUE_TTL
+
+
+class IssueCatalog:
+    """
+    Applicable issues fetched once and shared by all accounts until `ttl` expires.
+
+    Entries are keyed by `companyShareId`. The account specific `action` field is dropped
+    since it only describes the account the catalog was fetched with.
+    """
+
+    def __init__(self, fetch: Callable[[], list[dict]], ttl: float = APPLICABLE_ISSUE_TTL) -> None:
+        self.fetch = fetch
+        self.ttl = ttl
+        self._issues: dict[int, dict] = {}
+        self._fetched_at: float | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def expired(self) -> bool:
+        return self._fetched_at is None or time.monotonic() - self._fetched_at > self.ttl
+
+    def issues(self, refresh: bool = False) -> list[dict]:
+        with self._lock:
+            if refresh or self.expired:
+                logging.info("Refreshing applicable issue catalog!")
+                issues = self.fetch() or []
+                self._issues = {
+                    issue.get("companyShareId"): {
+                        key: value for key, value in issue.items() if key != "action"
+                    }
+                    for issue in issues
+                }
+                self._fetched_at = time.monotonic()
+
+            return list(self._issues.values())
+
+    def get(self, share_id: int) -> dict | None:
+        self.issues()
+        return self._issues.get(share_id)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._fetched_at = None
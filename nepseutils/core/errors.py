@@ -12,3 +12,15 @@ class GlobalError(Exception):
 
     def __str__(self):
         return self.message
+
+
+class TokenExpired(Exception):
+    def __init__(self, message: str):
+        self.message = message
+
+    def __str__(self):
+        return self.message
+
+
+class CircuitOpen(GlobalError):
+    pass
@@ -1,4 +1,23 @@
+from collections.abc import Iterable, Iterator
+
+
 class Issue:
+    __slots__ = (
+        "name",
+        "symbol",
+        "status",
+        "share_type",
+        "company_share_id",
+        "applicant_form_id",
+        "alloted",
+        "alloted_quantity",
+        "applied_date",
+        "applied_quantity",
+        "applied_amount",
+        "block_amount_status",
+        "old",
+    )
+
     name: str
     symbol: str
     status: str
@@ -11,7 +30,7 @@ class Issue:
     applied_quantity: float | None
     applied_amount: float | None
     block_amount_status: str | None
-    old: bool | None = None
+    old: bool | None
 
     def __init__(
         self,
@@ -77,3 +96,81 @@ class Issue:
             json["block_amount_status"],
             json["old"],
         )
+
+
+class IssueStore:
+    """
+    Ordered collection of issues indexed by company share ID, symbol and applicant form ID.
+    A company share ID can have several issues, e.g. when applied for again after a rejection.
+    Iterates and serializes like the plain list it replaces.
+    """
+
+    __slots__ = ("_issues", "_by_company_share_id", "_by_symbol", "_by_applicant_form_id")
+
+    def __init__(self, issues: Iterable[Issue] | None = None) -> None:
+        self._issues: list[Issue] = []
+        self._by_company_share_id: dict[int, list[Issue]] = {}
+        self._by_symbol: dict[str, Issue] = {}
+        self._by_applicant_form_id: dict[int, Issue] = {}
+
+        for issue in issues or []:
+            self.append(issue)
+
+    @staticmethod
+    def _key(value) -> int | None:
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+
+    def __iter__(self) -> Iterator[Issue]:
+        return iter(self._issues)
+
+    def __len__(self) -> int:
+        return len(self._issues)
+
+    def __getitem__(self, index: int) -> Issue:
+        return self._issues[index]
+
+    def append(self, issue: Issue) -> None:
+        self._issues.append(issue)
+
+        # First issue wins for each single issue lookup, matching lookups by linear scan
+        company_share_id = self._key(issue.company_share_id)
+        if company_share_id is not None:
+            self._by_company_share_id.setdefault(company_share_id, []).append(issue)
+
+        applicant_form_id = self._key(issue.applicant_form_id)
+        if applicant_form_id is not None:
+            self._by_applicant_form_id.setdefault(applicant_form_id, issue)
+
+        if issue.symbol is not None:
+            self._by_symbol.setdefault(issue.symbol, issue)
+
+    def upsert(self, issue: Issue) -> Issue:
+        """
+        Adds `issue` unless one with the same symbol exists, returning the stored issue.
+        """
+        existing = self.by_symbol(issue.symbol)
+
+        if existing is not None:
+            return existing
+
+        self.append(issue)
+        return issue
+
+    def by_company_share_id(self, company_share_id) -> Issue | None:
+        issues = self.all_by_company_share_id(company_share_id)
+        return issues[0] if issues else None
+
+    def all_by_company_share_id(self, company_share_id) -> list[Issue]:
+        return list(self._by_company_share_id.get(self._key(company_share_id), []))  # type: ignore
+
+    def by_symbol(self, symbol: str) -> Issue | None:
+        return self._by_symbol.get(symbol)
+
+    def by_applicant_form_id(self, applicant_form_id) -> Issue | None:
+        return self._by_applicant_form_id.get(self._key(applicant_form_id))  # type: ignore
+
+    def to_json(self) -> list:
+        return [issue.to_json() for issue in self._issues]
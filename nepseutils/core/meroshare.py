@@ -1,24 +1,59 @@
+import atexit
 import base64
+import functools
 import json
 import logging
 import os
+import threading
+import time
+import uuid
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
 from pathlib import Path
-
-import requests
-from cryptography.fernet import Fernet
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-from tenacity import retry
-from tenacity.stop import stop_after_attempt
-from tenacity.wait import wait_fixed
-
-from nepseutils.constants import BASE_HEADERS, MS_API_BASE
+from typing import TYPE_CHECKING
+
+from nepseutils.constants import (
+    ARM_TOKEN_REFRESH_LEAD,
+    ARM_WORKERS,
+    CAPITAL_LIST_TTL,
+    DEFAULT_POOL_SIZE,
+    DEFAULT_WORKERS,
+    MIN_APPLY_UNIT_TTL,
+    RATE_LIMIT,
+)
 from nepseutils.core.account import Account
+from nepseutils.core.catalog import IssueCatalog
 from nepseutils.core.errors import LocalException
-from nepseutils.utils.logging import TelegramLoggingHandler
+from nepseutils.core.portfolio import Portfolio
+from nepseutils.utils import agent, http, resilience
+from nepseutils.utils.agent import AgentClient, UnlockAgent
+from nepseutils.utils.cache import MetadataCache, conditional_get
+from nepseutils.utils.logging import TelegramLoggingHandler, start_listener, stop_listener
+from nepseutils.utils.parallel import AccountResult, run_for_accounts
+from nepseutils.utils.resilience import network_retry
+from nepseutils.utils.tracing import traced
+from nepseutils.utils.writer import WriteBehindWriter, atomic_write
 from nepseutils.version import __version__
 
+if TYPE_CHECKING:
+    from cryptography.fernet import Fernet
+
 DEFAULT_CONFIG_FILENAME = "config.json"
+METADATA_CACHE_FILENAME = "cache.json"
+
+# Accounts are stored as separately encrypted segments listed by an index in config file
+STORAGE_FORMAT = 2
+SEGMENT_DIRECTORY = "accounts"
+
+# Long running bulk operations persist progress at most this often (seconds)
+SYNC_FLUSH_INTERVAL = 30
+
+retry_conditional_get = network_retry(conditional_get)
+
+
+def sleep_until(timestamp: float) -> None:
+    while (remaining := timestamp - time.time()) > 0:
+        time.sleep(min(remaining, 1))
 
 
 class MeroShare:
@@ -28,13 +63,15 @@ class MeroShare:
     capitals: dict
     config_version: str
     logging_level: int
+    pool_size: int
+    rate_limit: float
     telegram_bot_token: str | None
     telegram_chat_id: str | None
 
     config_path: Path
-    fernet: Fernet
+    fernet: "Fernet"
 
-    logging_handler: TelegramLoggingHandler
+    logging_handler: TelegramLoggingHandler | None
 
     @property
     def accounts(self) -> list[Account]:
@@ -45,7 +82,7 @@ class MeroShare:
 
     def __init__(
         self,
-        fernet: Fernet,
+        fernet: "Fernet",
         accounts: list[Account] | None,
         capitals: dict | None,
         config_version: str = __version__,
@@ -53,57 +90,81 @@ class MeroShare:
         config_path: Path | None = None,
         telegram_bot_token: str | None = None,
         telegram_chat_id: str | None = None,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        rate_limit: float = RATE_LIMIT,
     ):
         self.logging_level = logging_level
         self.config_version = config_version
 
+        self.pool_size = pool_size
+        http.configure(pool_size)
+
+        self.rate_limit = rate_limit
+        resilience.configure(rate_limit)
+
         self.telegram_bot_token = telegram_bot_token
         self.telegram_chat_id = telegram_chat_id
 
+        self.logging_handler = None
+
         if telegram_bot_token and telegram_chat_id:
             self.logging_handler = TelegramLoggingHandler(telegram_bot_token, telegram_chat_id)
-            logging.basicConfig(
-                format="%(asctime)s %(message)s",
-                level=self.logging_level,
-                force=True,
-                handlers=[self.logging_handler],
-            )
+            start_listener(self.logging_level, self.logging_handler)
         else:
             if not os.path.exists(MeroShare.default_config_directory()):
                 os.makedirs(MeroShare.default_config_directory())
-            logging.basicConfig(
-                filename=f"{MeroShare.default_config_directory()}/nepseutils.log",
-                filemode="a",
-                format="%(asctime)s %(message)s",
-                level=self.logging_level,
-                force=True,
+            start_listener(
+                self.logging_level,
+                logging.FileHandler(f"{MeroShare.default_config_directory()}/nepseutils.log", mode="a"),
             )
 
-        self._accounts = accounts or []
+        self._accounts = []
         self.tag_selections = []
 
-        if config_path:
-            self.config_path = MeroShare.default_config_path()
+        self._save_lock = threading.RLock()
+        self._batch_depth = 0
+        self._batch_flush_interval: float | None = None
+        self._dirty = False
+        self._dirty_accounts: set[Account] = set()
+        self._segment_ids: dict[Account, str] = {}
+        self._written_index: list[str] = []
+        self._last_flush = time.monotonic()
+        self._writer = WriteBehindWriter()
+        atexit.register(self.close)
+
+        self.config_path = config_path or MeroShare.default_config_path()
+
+        self.metadata_cache = MetadataCache(self.config_path.parent / METADATA_CACHE_FILENAME)
+        self.issue_catalog = IssueCatalog(lambda: self.default_account.fetch_applicable_issues())
+
+        for account in accounts or []:
+            self._attach(account)
 
         if fernet:
             self.fernet = fernet
 
-        if capitals:
-            self.capitals = capitals
-        else:
-            self.update_capital_list()
+        # Capital list is fetched on demand when a DMAT cannot be resolved
+        self.capitals = capitals or {}
 
     @staticmethod
     def fernet_init(password):
+        from cryptography.fernet import Fernet
+
         logging.info("Initializing Fernet!")
+        return Fernet(MeroShare.derive_key(password))
+
+    @staticmethod
+    def derive_key(password: str) -> bytes:
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+
         kdf = PBKDF2HMAC(
             algorithm=hashes.SHA256(),
             length=32,
             salt=password.encode("UTF-8"),
             iterations=100000,
         )
-        key = base64.urlsafe_b64encode(kdf.derive(password.encode("UTF-8")))
-        return Fernet(key)
+        return base64.urlsafe_b64encode(kdf.derive(password.encode("UTF-8")))
 
     @staticmethod
     def default_config_directory() -> Path:
@@ -163,57 +224,270 @@ class MeroShare:
 
     @staticmethod
     def load(password: str, path: Path | None = None):
+        return MeroShare._load(MeroShare.fernet_init(password), path)
+
+    @staticmethod
+    def load_from_agent(path: Path | None = None):
+        """
+        Loads data using key and decrypted accounts held by a running unlock agent,
+        skipping key derivation and decryption entirely.
+        """
+        from cryptography.fernet import Fernet
+
+        client = AgentClient(agent.default_socket_path(MeroShare.default_config_directory()))
+        return MeroShare._load(Fernet(client.key()), path, client.segments)
+
+    @staticmethod
+    def agent_available() -> bool:
+        return AgentClient(agent.default_socket_path(MeroShare.default_config_directory())).available()
+
+    @staticmethod
+    def lock_agent():
+        client = AgentClient(agent.default_socket_path(MeroShare.default_config_directory()))
+
+        if client.available():
+            client.lock()
+
+    @staticmethod
+    def start_agent(
+        password: str, path: Path | None = None, lock_timeout: float = agent.DEFAULT_LOCK_TIMEOUT
+    ):
+        """
+        Verifies the password and starts an unlock agent in background.
+        """
+        ms = MeroShare.load(password, path)
+        ms.close()
+
+        unlock_agent = UnlockAgent(
+            MeroShare.derive_key(password),
+            ms.config_path.parent / SEGMENT_DIRECTORY,
+            lock_timeout,
+        )
+        socket_path = agent.default_socket_path(MeroShare.default_config_directory())
+        unlock_agent.daemonize(socket_path)
+
+        return socket_path
+
+    @staticmethod
+    def _load(
+        fernet: "Fernet",
+        path: Path | None = None,
+        read_segments: Callable[[list[str]], list[bytes]] | None = None,
+    ):
         path = path or MeroShare.default_config_path()
 
         with open(path, "r") as config_file:
             config = json.load(config_file)
 
-            config_version = config.get("config_version")
-            logging_level = config.get("logging_level")
-            telegram_bot_token = config.get("telegram_bot_token")
-            telegram_chat_id = config.get("telegram_chat_id")
-            capitals = config.get("capitals")
-
-            fernet = MeroShare.fernet_init(password)
-
-            encrypted_bytes = base64.b64decode(config.get("data"))
-            decrypted_data = fernet.decrypt(encrypted_bytes)
-            accounts = json.loads(decrypted_data)
-
-            ms = MeroShare(
-                fernet=fernet,
-                accounts=[],
-                capitals=capitals,
-                config_version=config_version,
-                logging_level=logging_level,
-                config_path=path,
-                telegram_bot_token=telegram_bot_token,
-                telegram_chat_id=telegram_chat_id,
-            )
-            accounts = [Account.from_json(account, ms.save_data) for account in accounts]
+        config_version = config.get("config_version")
+        logging_level = config.get("logging_level")
+        telegram_bot_token = config.get("telegram_bot_token")
+        telegram_chat_id = config.get("telegram_chat_id")
+        capitals = config.get("capitals")
+        pool_size = config.get("pool_size") or DEFAULT_POOL_SIZE
+        rate_limit = config.get("rate_limit", RATE_LIMIT)
 
-            ms._accounts = accounts
+        ms = MeroShare(
+            fernet=fernet,
+            accounts=[],
+            capitals=capitals,
+            config_version=config_version,
+            logging_level=logging_level,
+            config_path=path,
+            telegram_bot_token=telegram_bot_token,
+            telegram_chat_id=telegram_chat_id,
+            pool_size=pool_size,
+            rate_limit=rate_limit,
+        )
 
-            return ms
+        if config.get("storage_format") == STORAGE_FORMAT:
+            segment_ids = config.get("accounts") or []
 
-    def save_data(self):
-        logging.info("Saving data!")
-        with open(self.config_path, "w") as data_file:
-            data = [account.to_json() for account in self.accounts]
-            encrypted_data = self.fernet.encrypt(json.dumps(data).encode())
+            if read_segments:
+                segments = read_segments(segment_ids)
+            else:
+                segments = [
+                    fernet.decrypt(ms.segment_path(segment_id).read_bytes()) for segment_id in segment_ids
+                ]
+
+            for segment_id, segment in zip(segment_ids, segments):
+                ms._attach(Account.from_json(json.loads(segment)), segment_id)
+        else:
+            ms._migrate_single_blob(config)
+
+        return ms
 
-            data_file.write(
-                json.dumps(
+    def _migrate_single_blob(self, config: dict):
+        """
+        Converts config with all accounts encrypted as a single blob to per account segments.
+        The old file is kept as a backup until the new layout has been written.
+        """
+        logging.info("Migrating config to segmented storage format!")
+
+        encrypted_bytes = base64.b64decode(config.get("data"))
+        accounts = json.loads(self.fernet.decrypt(encrypted_bytes))
+
+        for account_data in accounts:
+            self._attach(Account.from_json(account_data))
+
+        backup_path = self.config_path.with_name(f"{self.config_path.name}.bak")
+        atomic_write(backup_path, json.dumps(config).encode())
+
+        self.save_data()
+
+    def _attach(self, account: Account, segment_id: str | None = None):
+        account.save = functools.partial(self.save_data, account)
+        self._accounts.append(account)
+
+        if segment_id:
+            self._segment_ids[account] = segment_id
+            self._written_index.append(segment_id)
+
+    def add_account(self, account: Account):
+        self._attach(account)
+        self.save_data(account)
+
+    def remove_account(self, account: Account):
+        self._accounts.remove(account)
+        self._segment_ids.pop(account, None)
+        self._dirty_accounts.discard(account)
+        self.save_settings()
+
+    def segment_path(self, segment_id: str) -> Path:
+        return self.config_path.parent / SEGMENT_DIRECTORY / segment_id
+
+    @contextmanager
+    def batch(self, flush_interval: float | None = None) -> Iterator["MeroShare"]:
+        """
+        Coalesces every `save_data` call made inside the block into a single write at the end.
+        If `flush_interval` is given, pending changes are also written once that many seconds
+        have passed since the last write. Batches can be nested; only the outermost one flushes.
+        """
+        with self._save_lock:
+            self._batch_depth += 1
+
+            if flush_interval is not None and self._batch_flush_interval is None:
+                self._batch_flush_interval = flush_interval
+
+        try:
+            yield self
+        finally:
+            with self._save_lock:
+                self._batch_depth -= 1
+
+                if self._batch_depth == 0:
+                    self._batch_flush_interval = None
+
+                    if self._dirty or self._dirty_accounts:
+                        self.flush()
+
+    def save_data(self, *accounts: Account):
+        """
+        Marks given accounts, or all data if none are given, as modified.
+        It is written immediately unless a `batch` is active.
+        """
+        with self._save_lock:
+            if accounts:
+                self._dirty_accounts.update(accounts)
+            else:
+                self._dirty = True
+                self._dirty_accounts.update(self._accounts)
+
+            self._schedule_flush()
+
+    def save_settings(self):
+        """
+        Marks settings and account index, but none of the accounts, as modified.
+        """
+        with self._save_lock:
+            self._dirty = True
+            self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self._batch_depth == 0:
+            return self.flush()
+
+        if (
+            self._batch_flush_interval is not None
+            and time.monotonic() - self._last_flush >= self._batch_flush_interval
+        ):
+            self.flush()
+
+    def flush(self):
+        """
+        Snapshots modified accounts and settings and hands them to the background writer.
+        Encryption and disk writes happen off the calling thread.
+        """
+        logging.info("Saving data!")
+        with self._save_lock:
+            segment_directory = self.config_path.parent / SEGMENT_DIRECTORY
+            segment_directory.mkdir(parents=True, exist_ok=True)
+
+            fernet = self.fernet
+            index = []
+            for account in self._accounts:
+                segment_id = self._segment_ids.get(account)
+
+                if segment_id is None:
+                    segment_id = self._segment_ids[account] = uuid.uuid4().hex
+                    self._dirty_accounts.add(account)
+
+                if account in self._dirty_accounts:
+                    account_data = json.dumps(account.to_json()).encode()
+                    self._writer.submit(
+                        self.segment_path(segment_id),
+                        functools.partial(fernet.encrypt, account_data),
+                    )
+
+                index.append(segment_id)
+
+            if self._dirty or index != self._written_index:
+                config_data = json.dumps(
                     {
                         "config_version": self.config_version,
                         "logging_level": self.logging_level,
                         "telegram_bot_token": self.telegram_bot_token,
                         "telegram_chat_id": self.telegram_chat_id,
                         "capitals": self.capitals,
-                        "data": base64.b64encode(encrypted_data).decode(),
+                        "pool_size": self.pool_size,
+                        "rate_limit": self.rate_limit,
+                        "storage_format": STORAGE_FORMAT,
+                        "accounts": index,
                     }
-                )
-            )
+                ).encode()
+                self._writer.submit(self.config_path, lambda: config_data)
+
+                for stale_segment in set(self._written_index) - set(index):
+                    self._writer.delete(self.segment_path(stale_segment))
+
+                self._written_index = index
+
+            self._dirty = False
+            self._dirty_accounts.clear()
+            self._last_flush = time.monotonic()
+
+    def wait_for_writes(self, timeout: float | None = None) -> bool:
+        """
+        Blocks until flushed changes have been written by the background writer.
+        """
+        return self._writer.flush(timeout)
+
+    def close(self):
+        """
+        Writes pending changes and waits for the background writer, logging and Telegram
+        notifications to finish.
+        """
+        with self._save_lock:
+            if self._dirty or self._dirty_accounts:
+                self.flush()
+
+        # Closed instances no longer need closing at exit, nor keeping alive until then
+        atexit.unregister(self.close)
+        self._writer.close()
+        stop_listener()
+
+        if self.logging_handler:
+            self.logging_handler.shutdown()
 
     def create_new_data(self, password):
         logging.info("Did not find any data file, creating new data!")
@@ -228,52 +502,187 @@ class MeroShare:
 
         return self.accounts[0]
 
-    def update_capital_list(self) -> dict:
-        capitals = self.fetch_capital_list()
+    @staticmethod
+    def sync_account(account: Account, full: bool = False) -> Account:
+        account.fetch_portfolio()
+        account.fetch_applied_issues(refetch=full)
+        account.fetch_applied_issues_status()
+        return account
+
+    @traced
+    def sync(
+        self,
+        workers: int = DEFAULT_WORKERS,
+        on_progress: Callable[[AccountResult, int, int], None] | None = None,
+        full: bool = False,
+    ) -> list[AccountResult]:
+        """
+        Syncs portfolio, applied issues and their status of selected accounts concurrently.
+        Failure of one account does not stop the others. `full` refetches the whole
+        application history, including the migrated archive.
+        """
+        logging.info("Syncing %s accounts with %s workers!", len(self.accounts), workers)
+        with self.batch(flush_interval=SYNC_FLUSH_INTERVAL):
+            return run_for_accounts(
+                self.accounts,
+                lambda account: MeroShare.sync_account(account, full),
+                workers,
+                on_progress,
+            )
+
+    @traced
+    def apply(
+        self,
+        share_id: int,
+        quantity: int,
+        workers: int = DEFAULT_WORKERS,
+        on_progress: Callable[[AccountResult, int, int], None] | None = None,
+        accounts: list[Account] | None = None,
+    ) -> list[AccountResult]:
+        """
+        Applies `quantity` units of `share_id` from `accounts`, all selected accounts by
+        default, concurrently.
+        """
+        accounts = self.accounts if accounts is None else accounts
+
+        logging.info("Applying %s units of %s for %s accounts!", quantity, share_id, len(accounts))
+        issue = self.issue_catalog.get(share_id)
+
+        with self.batch(flush_interval=SYNC_FLUSH_INTERVAL):
+            return run_for_accounts(
+                accounts,
+                lambda account: account.apply(share_id=share_id, quantity=quantity, issue=issue),
+                workers,
+                on_progress,
+            )
+
+    @traced
+    def arm(
+        self,
+        share_id: int,
+        quantity: int,
+        fire_at: float,
+        workers: int = ARM_WORKERS,
+        on_progress: Callable[[AccountResult, int, int], None] | None = None,
+    ) -> list[AccountResult]:
+        """
+        Prepares applications of all selected accounts now and submits them at `fire_at`.
+
+        Logins, account details and payloads are done ahead of time, so firing is a single
+        request per account. The result of each submitted account is a tuple of the
+        response and seconds elapsed since `fire_at` until it was accepted.
+        """
+        accounts = self.accounts
+        logging.info("Arming %s accounts to apply for %s!", len(accounts), share_id)
+
+        with self.batch(flush_interval=SYNC_FLUSH_INTERVAL):
+            prepared = run_for_accounts(
+                accounts, lambda account: account.prepare_apply(share_id, quantity), workers
+            )
+
+        payloads = {result.account: result.result for result in prepared if result.ok}
+        logging.info("Armed %s of %s accounts!", len(payloads), len(accounts))
+
+        # Renew tokens which would expire before firing shortly before firing, not on time
+        sleep_until(fire_at - ARM_TOKEN_REFRESH_LEAD)
+        run_for_accounts(
+            [account for account in payloads if account.token_valid_until < fire_at + ARM_TOKEN_REFRESH_LEAD],
+            lambda account: account.login(),
+            workers,
+        )
+
+        def fire(account: Account):
+            sleep_until(fire_at)
+            response = account.submit_apply(payloads[account])
+            return response, time.time() - fire_at
+
+        # Submissions are not held back by the shared rate limit, only retries are paced
+        fire_limiter = resilience.TokenBucket(self.rate_limit, max(len(payloads), self.rate_limit * 2))
+
+        with self.batch(flush_interval=SYNC_FLUSH_INTERVAL):
+            with resilience.use_limiter(fire_limiter):
+                fired = run_for_accounts(payloads, fire, workers, on_progress)
+
+            submitted = [result.account for result in fired if result.ok]
+            run_for_accounts(submitted, lambda account: account.fetch_applied_issues(), workers)
+
+        results = {result.account: result for result in prepared + fired}
+        return [results[account] for account in accounts]
+
+    def aggregate_portfolio(self, workers: int = DEFAULT_WORKERS) -> Portfolio:
+        """
+        Combined portfolio of selected accounts. Accounts never fetched are fetched first.
+        """
+        self.fetch_missing_portfolios(workers)
+        return Portfolio.aggregate(account.portfolio for account in self.accounts)
+
+    def aggregate_portfolio_by_tag(self, workers: int = DEFAULT_WORKERS) -> dict[str | None, Portfolio]:
+        self.fetch_missing_portfolios(workers)
+        return Portfolio.aggregate_by((account.tag, account.portfolio) for account in self.accounts)  # type: ignore
+
+    def fetch_missing_portfolios(self, workers: int = DEFAULT_WORKERS) -> list[AccountResult]:
+        missing = [account for account in self.accounts if len(account.portfolio.entries) == 0]
+        return run_for_accounts(missing, lambda account: account.fetch_portfolio(), workers)
+
+    def update_capital_list(self, force: bool = True) -> dict:
+        """
+        Updates capital list from metadata cache. If `force` is set, the cached list is
+        revalidated with the server even if it has not expired yet.
+        """
+        capitals = self.metadata_cache.get(
+            "capitals",
+            0 if force else CAPITAL_LIST_TTL,
+            lambda validators: retry_conditional_get(
+                http.api_url("meroShare/capital/"),
+                validators,
+                MeroShare.parse_capital_list,
+                headers={"Authorization": "null"},
+            ),
+        )
 
         self.capitals = capitals
 
-        self.save_data()
+        self.save_settings()
 
         logging.info("Capital list updated!")
         return capitals
 
     @staticmethod
-    @retry(stop=stop_after_attempt(3), wait=wait_fixed(2), reraise=True)
+    @network_retry
     def fetch_capital_list() -> dict:
-        capitals = {}
-        with requests.Session() as sess:
-            sess.headers = BASE_HEADERS  # type: ignore
-            headers = {
-                "Authorization": "null",
-            }
-            sess.headers.update(headers)
+        logging.info("Fetching capital list!")
+        cap_req = resilience.send(
+            "GET", http.api_url("meroShare/capital/"), headers={"Authorization": "null"}
+        )
 
-            logging.info("Fetching capital list!")
-            cap_req = sess.get(f"{MS_API_BASE}/meroShare/capital/")
+        if cap_req.status_code != 200:
+            raise LocalException("Failed to fetch capital list!")
 
-            if cap_req.status_code != 200:
-                raise LocalException("Failed to fetch capital list!")
+        return MeroShare.parse_capital_list(cap_req.json())
 
-            cap_list = cap_req.json()
+    @staticmethod
+    def parse_capital_list(cap_list: list) -> dict:
+        capitals = {}
 
-            for cap in cap_list:
-                capitals.update({cap.get("code"): cap.get("id")})
+        for cap in cap_list:
+            capitals.update({cap.get("code"): cap.get("id")})
 
         return capitals
 
+    def min_apply_unit(self, company_share_id: int) -> int:
+        return self.metadata_cache.get(
+            f"min_apply_unit:{company_share_id}",
+            MIN_APPLY_UNIT_TTL,
+            lambda _: (self.default_account.find_min_apply_unit(company_share_id), {}),
+        )
+
     @staticmethod
     def fetch_result_company_list() -> list:
-        with requests.Session() as sess:
-            sess.headers = BASE_HEADERS  # type: ignore
-
-            response = sess.get(
-                "https://iporesult.cdsc.com.np/result/companyShares/fileUploaded",
-            )
+        response = resilience.send("GET", http.result_url("result/companyShares/fileUploaded"))
 
-            if response.status_code != 200:
-                raise LocalException("Failed to fetch result company list!")
+        if response.status_code != 200:
+            raise LocalException("Failed to fetch result company list!")
 
-            result_company_list = response.json()
+        result_company_list = response.json()
 
-            return result_company_list.get("body").get("companyShareList")
+        return result_company_list.get("body").get("companyShareList")
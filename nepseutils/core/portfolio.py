@@ -1,4 +1,29 @@
+from collections.abc import Hashable, Iterable
+
+
+def _numpy():
+    """
+    Returns numpy if installed. It is optional and only speeds up bulk calculations.
+    """
+    try:
+        import numpy
+    except ImportError:
+        return None
+
+    return numpy
+
+
 class PortfolioEntry:
+    __slots__ = (
+        "current_balance",
+        "last_transaction_price",
+        "previous_closing_price",
+        "script",
+        "script_desc",
+        "value_as_of_last_transaction_price",
+        "value_as_of_previous_closing_price",
+    )
+
     current_balance: float
     last_transaction_price: float
     previous_closing_price: float
@@ -36,6 +61,17 @@ class PortfolioEntry:
             "value_as_of_previous_closing_price": self.value_as_of_previous_closing_price,
         }
 
+    def copy(self) -> "PortfolioEntry":
+        return PortfolioEntry(
+            self.current_balance,
+            self.last_transaction_price,
+            self.previous_closing_price,
+            self.script,
+            self.script_desc,
+            self.value_as_of_last_transaction_price,
+            self.value_as_of_previous_closing_price,
+        )
+
     @staticmethod
     def from_json(json: dict):
         return PortfolioEntry(
@@ -50,6 +86,13 @@ class PortfolioEntry:
 
 
 class Portfolio:
+    __slots__ = (
+        "entries",
+        "total_items",
+        "total_value_as_of_last_transaction_price",
+        "total_value_as_of_previous_closing_price",
+    )
+
     entries: list[PortfolioEntry]
 
     total_items: int
@@ -84,3 +127,90 @@ class Portfolio:
             json["total_value_as_of_last_transaction_price"],
             json["total_value_as_of_previous_closing_price"],
         )
+
+    @staticmethod
+    def aggregate(portfolios: Iterable["Portfolio"]) -> "Portfolio":
+        """
+        Merges portfolios into one, summing balances and values of the same scrip.
+        """
+        merged: dict[str, PortfolioEntry] = {}
+
+        for portfolio in portfolios:
+            for entry in portfolio.entries:
+                combined = merged.get(entry.script)
+
+                if combined is None:
+                    merged[entry.script] = entry.copy()
+                    continue
+
+                combined.current_balance += entry.current_balance
+                combined.value_as_of_last_transaction_price += entry.value_as_of_last_transaction_price
+                combined.value_as_of_previous_closing_price += entry.value_as_of_previous_closing_price
+
+        entries = list(merged.values())
+        total_value, total_value_as_of_closing = Portfolio.totals(entries)
+
+        return Portfolio(entries, len(entries), total_value, total_value_as_of_closing)
+
+    @staticmethod
+    def aggregate_by(portfolios: Iterable[tuple[Hashable, "Portfolio"]]) -> dict[Hashable, "Portfolio"]:
+        """
+        Merges `(key, portfolio)` pairs into one portfolio per key, e.g. per account tag.
+        """
+        groups: dict[Hashable, list[Portfolio]] = {}
+
+        for key, portfolio in portfolios:
+            groups.setdefault(key, []).append(portfolio)
+
+        return {key: Portfolio.aggregate(group) for key, group in groups.items()}
+
+    @staticmethod
+    def totals(entries: list[PortfolioEntry]) -> tuple[float, float]:
+        """
+        Returns total value as of last transaction price and as of previous closing price.
+        """
+        np = _numpy()
+
+        if np is not None and entries:
+            values = np.array(
+                [
+                    (entry.value_as_of_last_transaction_price, entry.value_as_of_previous_closing_price)
+                    for entry in entries
+                ],
+                dtype=float,
+            )
+            total_value, total_value_as_of_closing = values.sum(axis=0)
+            return float(total_value), float(total_value_as_of_closing)
+
+        return (
+            sum(entry.value_as_of_last_transaction_price for entry in entries),
+            sum(entry.value_as_of_previous_closing_price for entry in entries),
+        )
+
+    def changes(self) -> list[tuple[float, float]]:
+        """
+        Returns `(+/- amount, +/- %)` of every entry relative to previous closing value.
+        """
+        np = _numpy()
+
+        if np is not None and self.entries:
+            values = np.array(
+                [
+                    (entry.value_as_of_last_transaction_price, entry.value_as_of_previous_closing_price)
+                    for entry in self.entries
+                ],
+                dtype=float,
+            )
+            amounts = values[:, 0] - values[:, 1]
+            percents = np.divide(
+                amounts * 100, values[:, 1], out=np.zeros_like(amounts), where=values[:, 1] != 0
+            )
+            return list(zip(amounts.tolist(), percents.tolist()))
+
+        changes = []
+        for entry in self.entries:
+            amount = entry.value_as_of_last_transaction_price - entry.value_as_of_previous_closing_price
+            closing = entry.value_as_of_previous_closing_price
+            changes.append((amount, amount / closing * 100 if closing else 0.0))
+
+        return changes
@@ -0,0 +1,240 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from nepseutils.constants import (
+    DEFAULT_WORKERS,
+    SCHEDULER_CLOSING_INTERVAL,
+    SCHEDULER_CLOSING_WINDOW,
+    SCHEDULER_IDLE_INTERVAL,
+    SCHEDULER_MARKET_HOURS,
+    SCHEDULER_MARKET_INTERVAL,
+    SCHEDULER_STATUS_INTERVAL,
+)
+from nepseutils.utils import metrics
+from nepseutils.utils.parallel import AccountResult, run_for_accounts
+
+if TYPE_CHECKING:
+    from nepseutils.core.account import Account
+    from nepseutils.core.meroshare import MeroShare
+
+NEPAL_TIMEZONE = timezone(timedelta(hours=5, minutes=45))
+
+# Issue close dates are either ISO dates or formatted like "Dec 23, 2024 5:00:00 PM"
+CLOSE_DATE_FORMATS = ("%b %d, %Y %I:%M:%S %p", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d")
+
+# Issues can be applied for on every day except Saturday
+MARKET_DAYS = (6, 0, 1, 2, 3, 4)
+
+
+def is_auto_applicable(issue: dict) -> bool:
+    """
+    Issues applied for automatically: IPO ordinary shares for the general public.
+    """
+    return (
+        issue.get("shareTypeName") == "IPO"
+        and issue.get("shareGroupName") == "Ordinary Shares"
+        and issue.get("subGroup") == "For General Public"
+    )
+
+
+def parse_close_date(issue: dict) -> datetime | None:
+    close_date = issue.get("issueCloseDate")
+
+    for date_format in CLOSE_DATE_FORMATS:
+        try:
+            parsed = datetime.strptime(str(close_date), date_format)
+        except ValueError:
+            continue
+
+        # Issues without a closing time close at the end of market hours
+        if date_format == "%Y-%m-%d":
+            parsed = parsed.replace(hour=SCHEDULER_MARKET_HOURS[1])
+
+        return parsed.replace(tzinfo=NEPAL_TIMEZONE)
+
+    return None
+
+
+def refresh_issues(account: "Account") -> None:
+    account.fetch_applied_issues()
+    account.fetch_applied_issues_status()
+
+
+class Scheduler:
+    """
+    Keeps a MeroShare instance unlocked and its sessions warm, applying for new issues
+    as soon as they appear and refreshing allotment status in the background.
+
+    Polling adapts to when issues can be applied for, so it is frequent during market
+    hours in Nepal and near close dates, and rare otherwise.
+    """
+
+    def __init__(
+        self, ms: "MeroShare", workers: int = DEFAULT_WORKERS, metrics_path: Path | None = None
+    ) -> None:
+        self.ms = ms
+        self.workers = workers
+        self.metrics_path = metrics_path
+        self.applied: set[int] = set()
+        self.applied_accounts: dict[int, set[str]] = {}
+        self.last_status_refresh: float | None = None
+        self._status_thread: threading.Thread | None = None
+        self._stop = threading.Event()
+        # Accounts are not safe to update from two threads at once, so applying, status
+        # refreshes and catalog fetches with the default account each hold its lock
+        self._account_locks: dict[str, threading.Lock] = {}
+        self._account_locks_lock = threading.Lock()
+
+    @staticmethod
+    def in_market_hours(now: datetime) -> bool:
+        now = now.astimezone(NEPAL_TIMEZONE)
+        opens, closes = SCHEDULER_MARKET_HOURS
+        return now.weekday() in MARKET_DAYS and opens <= now.hour < closes
+
+    def poll_interval(self, issues: list[dict], now: datetime) -> float:
+        """
+        Seconds to wait before polling applicable issues again.
+        """
+        for issue in issues:
+            if issue.get("companyShareId") in self.applied:
+                continue
+
+            close_date = parse_close_date(issue)
+            if close_date and timedelta(0) < close_date - now < timedelta(seconds=SCHEDULER_CLOSING_WINDOW):
+                return SCHEDULER_CLOSING_INTERVAL
+
+        if self.in_market_hours(now):
+            return SCHEDULER_MARKET_INTERVAL
+
+        return SCHEDULER_IDLE_INTERVAL
+
+    def account_lock(self, account: "Account") -> threading.Lock:
+        with self._account_locks_lock:
+            return self._account_locks.setdefault(account.dmat, threading.Lock())
+
+    def apply_locked(self, share_id: int, quantity: int, accounts: list["Account"]) -> list[AccountResult]:
+        """
+        Applies from `accounts`, whose locks are held by the caller, releasing them afterwards.
+        """
+        try:
+            return self.ms.apply(
+                share_id=share_id, quantity=quantity, workers=self.workers, accounts=accounts
+            )
+        finally:
+            for account in accounts:
+                self.account_lock(account).release()
+
+    def apply_matching(self, issues: list[dict]) -> list[int]:
+        """
+        Applies for auto applicable issues from accounts that have not applied yet, returning
+        the share IDs applied for from every account. Failed accounts are retried next tick.
+        """
+        applied = []
+
+        for issue in issues:
+            share_id = int(issue.get("companyShareId") or 0)
+
+            if share_id in self.applied or not is_auto_applicable(issue):
+                continue
+
+            applied_accounts = self.applied_accounts.setdefault(share_id, set())
+            pending = [account for account in self.ms.accounts if account.dmat not in applied_accounts]
+
+            try:
+                min_unit = self.ms.min_apply_unit(share_id)
+            except Exception as _:
+                min_unit = 10
+
+            logging.info("Applying for %s from %s accounts!", issue.get("scrip"), len(pending))
+
+            # Accounts the status refresh is not updating apply right away, the rest once
+            # the refresh is done with them
+            free = [account for account in pending if self.account_lock(account).acquire(blocking=False)]
+            busy = [account for account in pending if account not in free]
+            results = self.apply_locked(share_id, min_unit, free) if free else []
+
+            for account in busy:
+                self.account_lock(account).acquire()
+            if busy:
+                results += self.apply_locked(share_id, min_unit, busy)
+
+            applied_accounts.update(result.account.dmat for result in results if result.ok)
+            failed = sum(1 for result in results if not result.ok)
+
+            if failed:
+                logging.warning(
+                    "Failed to apply for %s from %s accounts, retrying next poll!", issue.get("scrip"), failed
+                )
+                continue
+
+            self.applied.add(share_id)
+            applied.append(share_id)
+
+        return applied
+
+    def refresh_account(self, account: "Account") -> None:
+        with self.account_lock(account):
+            refresh_issues(account)
+
+    def refresh_statuses(self) -> None:
+        with self.ms.batch():
+            run_for_accounts(self.ms.accounts, self.refresh_account, self.workers)
+
+        self.last_status_refresh = time.time()
+
+    def refresh_statuses_in_background(self) -> None:
+        if self._status_thread and self._status_thread.is_alive():
+            return
+
+        self._status_thread = threading.Thread(
+            target=self.refresh_statuses, name="nepseutils-status-refresh", daemon=True
+        )
+        self._status_thread.start()
+
+    def wait_for_status_refresh(self) -> None:
+        if self._status_thread:
+            self._status_thread.join()
+
+    def tick(self) -> float:
+        """
+        Polls once, applying for new issues. Returns seconds until the next poll.
+        """
+        try:
+            with self.account_lock(self.ms.default_account):
+                issues = self.ms.issue_catalog.issues(refresh=True)
+        except Exception as e:
+            logging.error("Failed to fetch applicable issues: %s", e)
+            return SCHEDULER_CLOSING_INTERVAL
+
+        applied = self.apply_matching(issues)
+
+        if (
+            applied
+            or self.last_status_refresh is None
+            or time.time() - self.last_status_refresh > SCHEDULER_STATUS_INTERVAL
+        ):
+            self.refresh_statuses_in_background()
+
+        return self.poll_interval(issues, datetime.now(NEPAL_TIMEZONE))
+
+    def run(self) -> None:
+        logging.info("Scheduler started for %s accounts!", len(self.ms.accounts))
+
+        while not self._stop.is_set():
+            interval = self.tick()
+
+            if self.metrics_path:
+                metrics.registry.write(self.metrics_path)
+
+            logging.info("Next poll in %.0f seconds", interval)
+            self._stop.wait(interval)
+
+        self.wait_for_status_refresh()
+        logging.info("Scheduler stopped!")
+
+    def stop(self) -> None:
+        self._stop.set()
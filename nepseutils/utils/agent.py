@@ -0,0 +1,171 @@
+import json
+import logging
+import os
+import socket
+import time
+from pathlib import Path
+
+from nepseutils.core.errors import LocalException
+
+AGENT_SOCKET_ENV = "NEPSEUTILS_AGENT_SOCK"
+AGENT_SOCKET_FILENAME = "agent.sock"
+
+# Agent forgets the key and exits after this many seconds without a request
+DEFAULT_LOCK_TIMEOUT = 15 * 60
+
+
+def default_socket_path(config_directory: Path) -> Path:
+    if os.getenv(AGENT_SOCKET_ENV):
+        return Path(os.getenv(AGENT_SOCKET_ENV))  # type: ignore
+
+    return config_directory / AGENT_SOCKET_FILENAME
+
+
+def is_supported() -> bool:
+    return hasattr(socket, "AF_UNIX")
+
+
+class UnlockAgent:
+    """
+    Long lived process holding the derived config key, similar to ssh-agent.
+
+    Clients talk newline delimited JSON over a Unix socket. Decrypted account segments
+    are cached and only decrypted again when the segment file changes on disk.
+    """
+
+    def __init__(self, key: bytes, segment_directory: Path, lock_timeout: float = DEFAULT_LOCK_TIMEOUT):
+        from cryptography.fernet import Fernet
+
+        self.key = key
+        self.fernet = Fernet(key)
+        self.segment_directory = segment_directory
+        self.lock_timeout = lock_timeout
+        self.locked = False
+        self._segments: dict[str, tuple[int, int, str]] = {}
+
+    def segment(self, segment_id: str) -> str:
+        path = self.segment_directory / Path(segment_id).name
+        stat = path.stat()
+
+        cached = self._segments.get(segment_id)
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return cached[2]
+
+        plaintext = self.fernet.decrypt(path.read_bytes()).decode()
+        self._segments[segment_id] = (stat.st_mtime_ns, stat.st_size, plaintext)
+        return plaintext
+
+    def handle(self, request: dict) -> dict:
+        op = request.get("op")
+
+        if op == "status":
+            return {"ok": True, "lock_timeout": self.lock_timeout}
+
+        if op == "key":
+            return {"ok": True, "key": self.key.decode()}
+
+        if op == "segments":
+            return {"ok": True, "segments": [self.segment(segment_id) for segment_id in request["ids"]]}
+
+        if op == "lock":
+            self.locked = True
+            return {"ok": True}
+
+        return {"ok": False, "error": f"Unknown operation: {op}"}
+
+    def serve(self, socket_path: Path) -> None:
+        socket_path.unlink(missing_ok=True)
+
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o177)
+        try:
+            server.bind(str(socket_path))
+        finally:
+            os.umask(old_umask)
+
+        server.listen()
+        server.settimeout(1)
+        last_request = time.monotonic()
+
+        logging.info(f"Unlock agent listening on {socket_path}")
+
+        try:
+            while not self.locked and time.monotonic() - last_request < self.lock_timeout:
+                try:
+                    connection, _ = server.accept()
+                except socket.timeout:
+                    continue
+
+                last_request = time.monotonic()
+
+                with connection, connection.makefile("rwb") as stream:
+                    try:
+                        response = self.handle(json.loads(stream.readline()))
+                    except Exception as e:
+                        response = {"ok": False, "error": str(e)}
+
+                    stream.write(json.dumps(response).encode() + b"\n")
+                    stream.flush()
+        finally:
+            server.close()
+            socket_path.unlink(missing_ok=True)
+            self._segments.clear()
+            logging.info("Unlock agent locked!")
+
+    def daemonize(self, socket_path: Path) -> None:
+        """
+        Forks into the background and serves until locked or idle for `lock_timeout`.
+        """
+        if os.fork() > 0:
+            return
+
+        os.setsid()
+
+        if os.fork() > 0:
+            os._exit(0)
+
+        devnull = os.open(os.devnull, os.O_RDWR)
+        for fd in (0, 1, 2):
+            os.dup2(devnull, fd)
+
+        try:
+            self.serve(socket_path)
+        finally:
+            os._exit(0)
+
+
+class AgentClient:
+    def __init__(self, socket_path: Path):
+        self.socket_path = socket_path
+
+    def available(self) -> bool:
+        if not is_supported() or not self.socket_path.exists():
+            return False
+
+        try:
+            return self.request("status").get("ok", False)
+        except OSError:
+            return False
+
+    def request(self, op: str, **kwargs) -> dict:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(str(self.socket_path))
+
+            with client.makefile("rwb") as stream:
+                stream.write(json.dumps({"op": op, **kwargs}).encode() + b"\n")
+                stream.flush()
+                response = json.loads(stream.readline())
+
+        if not response.get("ok"):
+            raise LocalException(f"Agent request failed: {response.get('error')}")
+
+        return response
+
+    def key(self) -> bytes:
+        return self.request("key")["key"].encode()
+
+    def segments(self, segment_ids: list[str]) -> list[bytes]:
+        return [segment.encode() for segment in self.request("segments", ids=segment_ids)["segments"]]
+
+    def lock(self) -> None:
+        self.request("lock")
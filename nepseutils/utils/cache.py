@@ -0,0 +1,111 @@
+import json
+import logging
+import threading
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+from nepseutils.core.errors import LocalException
+from nepseutils.utils import resilience
+from nepseutils.utils.writer import atomic_write
+
+# A fetch gets the stored validators and returns the new value with its validators,
+# or None if the server confirmed the stored value is still current.
+Fetch = Callable[[dict], "tuple[Any, dict] | None"]
+
+
+def conditional_get(url: str, validators: dict, parse: Callable[[Any], Any], headers: dict | None = None):
+    """
+    GETs `url` revalidating with ETag / Last-Modified from `validators`, for use as a `Fetch`.
+    """
+    request_headers = dict(headers or {})
+
+    if validators.get("etag"):
+        request_headers["If-None-Match"] = validators["etag"]
+
+    if validators.get("last_modified"):
+        request_headers["If-Modified-Since"] = validators["last_modified"]
+
+    response = resilience.send("GET", url, headers=request_headers)
+
+    if response.status_code == 304:
+        return None
+
+    if response.status_code != 200:
+        raise LocalException(f"Failed to fetch {url}! Status: {response.status_code}")
+
+    return parse(response.json()), {
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+    }
+
+
+class MetadataCache:
+    """
+    On disk cache for reference data that rarely changes, like capitals and minimum units.
+
+    Every entry has its own TTL. Expired entries are revalidated through their fetch, and
+    kept if the fetch fails so commands keep working while the API is unreachable.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._entries: dict[str, dict] | None = None
+        self._lock = threading.RLock()
+
+    @property
+    def entries(self) -> dict[str, dict]:
+        if self._entries is None:
+            try:
+                self._entries = json.loads(self.path.read_text())
+            except (OSError, ValueError):
+                self._entries = {}
+
+        return self._entries  # type: ignore
+
+    def get(self, key: str, ttl: float, fetch: Fetch) -> Any:
+        with self._lock:
+            entry = self.entries.get(key)
+
+            if entry and time.time() - entry["fetched_at"] < ttl:
+                return entry["value"]
+
+            try:
+                result = fetch(entry["validators"] if entry else {})
+            except Exception as e:
+                if not entry:
+                    raise
+
+                logging.warning("Failed to refresh %s, using cached value: %s", key, e)
+                return entry["value"]
+
+            if result is None and entry:
+                logging.info("Cached %s is still valid!", key)
+                entry["fetched_at"] = time.time()
+            else:
+                value, validators = result or (None, {})
+                entry = self.entries[key] = {
+                    "value": value,
+                    "validators": validators,
+                    "fetched_at": time.time(),
+                }
+
+            self._save()
+            return entry["value"]
+
+    def invalidate(self, key: str | None = None) -> None:
+        """
+        Drops `key`, or every entry if no key is given, forcing the next `get` to fetch.
+        """
+        with self._lock:
+            if key is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(key, None)
+
+            self._save()
+
+    def _save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write(self.path, json.dumps(self.entries).encode())
@@ -48,7 +48,7 @@ def pre_versioning_to_current():
         pin = account["pin"]
         crn = account["crn"]
         capital_id = account["capital_id"]
-        ms.accounts.append(Account(dmat, password, int(pin), int(capital_id), crn))
+        ms.add_account(Account(dmat, password, int(pin), int(capital_id), crn))
 
     ms.save_data()
 
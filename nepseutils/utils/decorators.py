@@ -1,13 +1,26 @@
+import functools
+
+from nepseutils.core.errors import TokenExpired
+
+
 def login_required(func):
     """
     Decorator to check if the user is logged in or not.
-    If not, login and then execute the function.
+    If not, or if the cached token has expired, login and then execute the function.
+    If the server rejects the token, login again and retry once.
     """
 
+    @functools.wraps(func)
     def wrapper(self, *args, **kwargs):
-        if not self.auth_token:
+        if not self.auth_token or self.token_expired:
+            self.login()
+
+        try:
+            return func(self, *args, **kwargs)
+        except TokenExpired:
+            self.auth_token = None
             self.login()
-        return func(self, *args, **kwargs)
+            return func(self, *args, **kwargs)
 
     return wrapper
 
@@ -17,6 +30,7 @@ def autosave(func):
     Decorator to save the account after executing the function.
     """
 
+    @functools.wraps(func)
     def wrapper(self, *args, **kwargs):
         result = func(self, *args, **kwargs)
         self.save()
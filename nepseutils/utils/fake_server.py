@@ -0,0 +1,460 @@
+"""
+Local stand-in for the MeroShare and CDSC result APIs, and Telegram's sendMessage.
+
+Implements the endpoints used by nepseutils with in-memory state, so accounts can be
+exercised offline in tests and benchmarks. Latency, error rate and rate limits are
+configurable to simulate an overloaded API.
+
+Run standalone with `python -m nepseutils.utils.fake_server` and point nepseutils at it
+with NEPSEUTILS_API_BASE and NEPSEUTILS_RESULT_API_BASE.
+"""
+
+import argparse
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeAccount:
+    def __init__(
+        self,
+        dmat: str,
+        password: str,
+        name: str,
+        capital_id: int = 1,
+        bank_code: str = "BANK",
+        account_number: str = "0000000000000001",
+        portfolio: list[dict] | None = None,
+        migrated: list[dict] | None = None,
+    ) -> None:
+        self.dmat = dmat
+        self.username = int(dmat[-8:])
+        self.password = password
+        self.name = name
+        self.capital_id = capital_id
+        self.bank_code = bank_code
+        self.account_number = account_number
+        self.portfolio = portfolio or []
+        self.migrated = migrated or []
+        self.applications: list[dict] = []
+
+
+class FakeIssue:
+    def __init__(
+        self,
+        company_share_id: int,
+        scrip: str,
+        company_name: str,
+        share_type: str = "IPO",
+        share_group: str = "Ordinary Shares",
+        sub_group: str = "For General Public",
+        close_date: str = "2030-01-01",
+        min_unit: int = 10,
+        price: float = 100.0,
+    ) -> None:
+        self.company_share_id = company_share_id
+        self.scrip = scrip
+        self.company_name = company_name
+        self.share_type = share_type
+        self.share_group = share_group
+        self.sub_group = sub_group
+        self.close_date = close_date
+        self.min_unit = min_unit
+        self.price = price
+        self.open = True
+
+
+class FakeMeroShareServer:
+    """
+    Threaded HTTP server emulating MeroShare. Use as a context manager or call
+    `start` and `stop`. `api_base` and `result_base` are the URLs to point nepseutils at.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        rate_limit: float | None = None,
+    ) -> None:
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+
+        self.accounts: dict[int, FakeAccount] = {}
+        self.issues: dict[int, FakeIssue] = {}
+        self.capitals: dict[str, int] = {}
+        self.results: dict[tuple[int, int], tuple[str, int]] = {}
+
+        self.requests: Counter = Counter()
+        self.telegram_messages: list[tuple[str, str]] = []
+
+        self._tokens: dict[str, int] = {}
+        self._form_ids = itertools.count(1000)
+        self._token_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._allowance = rate_limit or 0.0
+        self._last_check = time.monotonic()
+
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def api_base(self) -> str:
+        return f"{self.base_url}/api"
+
+    @property
+    def result_base(self) -> str:
+        return self.base_url
+
+    def start(self) -> "FakeMeroShareServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeMeroShareServer":
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    def add_account(self, account: FakeAccount) -> FakeAccount:
+        self.accounts[account.username] = account
+        self.capitals.setdefault(account.dmat[3:8], account.capital_id)
+        return account
+
+    def add_issue(self, issue: FakeIssue) -> FakeIssue:
+        self.issues[issue.company_share_id] = issue
+        return issue
+
+    def set_result(self, company_share_id: int, dmat: str, status: str, received_kitta: int = 0) -> None:
+        """
+        Sets allotment status ("Alloted", "Not Alloted", "Rejected") of an application.
+        """
+        self.results[(company_share_id, int(dmat[-8:]))] = (status, received_kitta)
+
+    def expire_tokens(self) -> None:
+        with self._lock:
+            self._tokens.clear()
+
+    def _throttled(self) -> bool:
+        if not self.rate_limit:
+            return False
+
+        with self._lock:
+            now = time.monotonic()
+            self._allowance = min(
+                self.rate_limit, self._allowance + (now - self._last_check) * self.rate_limit
+            )
+            self._last_check = now
+
+            if self._allowance < 1:
+                return True
+
+            self._allowance -= 1
+            return False
+
+    def _login(self, body: dict):
+        account = self.accounts.get(int(body.get("username") or 0))
+
+        if (
+            not account
+            or account.password != body.get("password")
+            or str(account.capital_id) != str(body.get("clientId"))
+        ):
+            return 401, {"message": "Invalid credentials"}, {}
+
+        token = f"fake-token-{next(self._token_ids)}"
+        with self._lock:
+            self._tokens[token] = account.username
+
+        return 200, {"passwordExpired": False, "accountExpired": False, "dematExpired": False}, {
+            "Authorization": token
+        }
+
+    def _report(self, application: dict) -> dict:
+        issue = self.issues[application["companyShareId"]]
+        return {
+            "companyName": issue.company_name,
+            "scrip": issue.scrip,
+            "statusName": "TRANSACTION_SUCCESS",
+            "shareTypeName": issue.share_type,
+            "companyShareId": issue.company_share_id,
+            "applicantFormId": application["applicantFormId"],
+        }
+
+    def _detail(self, account: FakeAccount, application: dict) -> dict:
+        status, kitta = self.results.get(
+            (application["companyShareId"], account.username), ("Verified", 0)
+        )
+        return {
+            "statusName": status,
+            "receivedKitta": kitta,
+            "appliedDate": application["appliedDate"],
+            "appliedKitta": application["appliedKitta"],
+            "amount": application["amount"],
+            "meroshareRemark": "Amount blocked",
+            "reasonOrRemark": None,
+        }
+
+    def _authenticated(self, account: FakeAccount, method: str, path: str, body: dict):
+        if method == "POST" and path == "meroShare/companyShare/applicableIssue/":
+            applied = {application["companyShareId"] for application in account.applications}
+            return 200, {
+                "object": [
+                    {
+                        "companyShareId": issue.company_share_id,
+                        "companyName": issue.company_name,
+                        "scrip": issue.scrip,
+                        "shareTypeName": issue.share_type,
+                        "shareGroupName": issue.share_group,
+                        "subGroup": issue.sub_group,
+                        "issueCloseDate": issue.close_date,
+                        "action": "edit" if issue.company_share_id in applied else None,
+                    }
+                    for issue in self.issues.values()
+                    if issue.open
+                ],
+                "totalCount": len(self.issues),
+            }
+
+        if method == "POST" and path in (
+            "meroShare/applicantForm/active/search/",
+            "meroShare/migrated/applicantForm/search/",
+        ):
+            if path.startswith("meroShare/migrated"):
+                reports = account.migrated
+            else:
+                reports = [self._report(application) for application in reversed(account.applications)]
+
+            page, size = int(body.get("page") or 1), int(body.get("size") or 200)
+            return 200, {
+                "object": reports[(page - 1) * size : page * size],
+                "totalCount": len(reports),
+            }
+
+        if method == "POST" and path == "meroShare/applicantForm/share/apply":
+            share_id = int(body.get("companyShareId") or 0)
+            issue = self.issues.get(share_id)
+
+            if not issue or not issue.open:
+                return 400, {"message": "Issue not open"}
+
+            if any(application["companyShareId"] == share_id for application in account.applications):
+                return 409, {"message": "Already applied"}
+
+            if body.get("transactionPIN") is None or not body.get("crnNumber"):
+                return 400, {"message": "Invalid application"}
+
+            kitta = int(body.get("appliedKitta") or 0)
+            account.applications.append(
+                {
+                    "companyShareId": share_id,
+                    "applicantFormId": next(self._form_ids),
+                    "appliedKitta": kitta,
+                    "amount": kitta * issue.price,
+                    "appliedDate": time.strftime("%Y-%m-%d"),
+                }
+            )
+            return 201, {"status": "CREATED", "message": "Share has been applied successfully."}
+
+        match = re.fullmatch(r"meroShare/applicantForm/report/detail/(\d+)", path)
+        if method == "GET" and match:
+            for application in account.applications:
+                if application["applicantFormId"] == int(match.group(1)):
+                    return 200, self._detail(account, application)
+            return 404, {"message": "Form not found"}
+
+        match = re.fullmatch(r"meroShare/migrated/applicantForm/report/(\d+)", path)
+        if method == "GET" and match:
+            for report in account.migrated:
+                if report.get("applicantFormId") == int(match.group(1)):
+                    return 200, {"statusName": report.get("result", "Not Alloted"), "receivedKitta": 0}
+            return 404, {"message": "Form not found"}
+
+        if method == "GET" and path == f"meroShareView/myDetail/{account.dmat}":
+            return 200, {"name": account.name, "bankCode": account.bank_code, "boid": account.dmat[-8:]}
+
+        if method == "GET" and path == f"bankRequest/{account.bank_code}":
+            return 200, {"accountNumber": account.account_number}
+
+        if method == "GET" and path == "meroShare/bank/":
+            return 200, [{"id": 44, "code": account.bank_code, "name": "Fake Bank"}]
+
+        if method == "GET" and path == "meroShare/bank/44":
+            return 200, [{"accountBranchId": 55, "id": 66, "accountTypeId": 1}]
+
+        match = re.fullmatch(r"meroShare/active/(\d+)", path)
+        if method == "GET" and match:
+            issue = self.issues.get(int(match.group(1)))
+            if not issue:
+                return 404, {"message": "Issue not found"}
+            return 200, {"minUnit": issue.min_unit, "maxUnit": 1000, "sharePerUnit": issue.price}
+
+        if method == "POST" and path == "meroShareView/myPortfolio/":
+            return 200, {
+                "meroShareMyPortfolio": account.portfolio,
+                "totalItems": len(account.portfolio),
+                "totalValueAsOfLastTransactionPrice": sum(
+                    float(entry["valueAsOfLastTransactionPrice"]) for entry in account.portfolio
+                ),
+                "totalValueAsOfPreviousClosingPrice": sum(
+                    float(entry["valueAsOfPreviousClosingPrice"]) for entry in account.portfolio
+                ),
+            }
+
+        if method == "POST" and path == "EDIS/report/search/":
+            return 200, {"object": [], "totalCount": 0}
+
+        if method == "GET" and path == "meroShare/auth/logout/":
+            return 201, {"message": "Logged out"}
+
+        return 404, {"message": f"Unknown endpoint {method} {path}"}
+
+    def handle(self, method: str, path: str, headers, body: dict):
+        """
+        Returns status, JSON payload and extra headers for a request.
+        """
+        path = path.split("?")[0]
+
+        if path == "/result/companyShares/fileUploaded":
+            return 200, {
+                "body": {
+                    "companyShareList": [
+                        {"id": issue.company_share_id, "scrip": issue.scrip, "name": issue.company_name}
+                        for issue in self.issues.values()
+                    ]
+                }
+            }, {}
+
+        if method == "POST" and re.fullmatch(r"/bot[^/]+/sendMessage", path):
+            text = str(body.get("text") or "")
+
+            if not text or len(text) > 4096:
+                return 400, {"ok": False, "description": "Bad Request: message is empty or too long"}, {}
+
+            with self._lock:
+                self.telegram_messages.append((str(body.get("chat_id")), text))
+
+            return 200, {"ok": True, "result": {"text": text}}, {}
+
+        if not path.startswith("/api/"):
+            return 404, {"message": "Not found"}, {}
+
+        path = path[len("/api/") :]
+
+        if method == "GET" and path == "meroShare/capital/":
+            return 200, [{"code": code, "id": capital_id} for code, capital_id in self.capitals.items()], {}
+
+        if method == "POST" and path == "meroShare/auth/":
+            return self._login(body)
+
+        with self._lock:
+            username = self._tokens.get(headers.get("Authorization") or "")
+
+        if username is None:
+            return 401, {"message": "Unauthorized"}, {}
+
+        account = self.accounts[username]
+
+        if path == "meroShare/auth/logout/":
+            with self._lock:
+                self._tokens.pop(headers.get("Authorization"), None)
+
+        status, payload = self._authenticated(account, method, path, body)
+        return status, payload, {}
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _respond(self, method: str):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw_body = self.rfile.read(length) if length else b""
+
+                try:
+                    body = json.loads(raw_body) if raw_body else {}
+                except ValueError:
+                    body = {}
+
+                with server._lock:
+                    server.requests[(method, re.sub(r"/\d+", "/{id}", self.path))] += 1
+
+                if server.latency:
+                    time.sleep(server.latency)
+
+                if server._throttled():
+                    status, payload, headers = 429, {"message": "Too many requests"}, {}
+                elif server.error_rate and random.random() < server.error_rate:
+                    status, payload, headers = 500, {"message": "Internal server error"}, {}
+                else:
+                    status, payload, headers = server.handle(method, self.path, self.headers, body)
+
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._respond("GET")
+
+            def do_POST(self):
+                self._respond("POST")
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local fake MeroShare API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests failing with 500")
+    parser.add_argument("--rate-limit", type=float, default=None, help="Requests per second before 429")
+    parser.add_argument("--accounts", type=int, default=10, help="Number of synthetic accounts")
+    args = parser.parse_args()
+
+    server = FakeMeroShareServer(args.host, args.port, args.latency, args.error_rate, args.rate_limit)
+
+    for index in range(1, args.accounts + 1):
+        server.add_account(FakeAccount(f"13010000{index:08d}", "password", f"Account {index}"))
+
+    server.add_issue(FakeIssue(1, "FAKE", "Fake Hydropower Limited"))
+
+    print(f"NEPSEUTILS_API_BASE={server.api_base}")
+    print(f"NEPSEUTILS_RESULT_API_BASE={server.result_base}")
+    print("Accounts use DMAT 13010000XXXXXXXX, password 'password' and capital id 1")
+
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import re
+import threading
+from typing import TYPE_CHECKING
+
+from nepseutils import constants
+from nepseutils.constants import BASE_HEADERS, DEFAULT_POOL_SIZE
+
+if TYPE_CHECKING:
+    import requests
+
+# requests is imported when the first session is built since it dominates startup time
+_session: "requests.Session | None" = None
+_pool_size: int = DEFAULT_POOL_SIZE
+_lock = threading.Lock()
+
+
+def _build_session(pool_size: int) -> "requests.Session":
+    from http.cookiejar import DefaultCookiePolicy
+
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    sess = requests.Session()
+    sess.headers.update(BASE_HEADERS)
+
+    # The session is shared by every account, so cookies must never be carried between them.
+    sess.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    sess.mount("https://", adapter)
+    sess.mount("http://", adapter)
+    return sess
+
+
+def configure(pool_size: int = DEFAULT_POOL_SIZE) -> None:
+    """
+    Sets the keep-alive pool size of the shared session.
+    Existing connections are dropped if the size changes.
+    """
+    global _session, _pool_size
+
+    with _lock:
+        if pool_size == _pool_size:
+            return
+
+        if _session is not None:
+            _session.close()
+
+        _pool_size = pool_size
+        _session = None
+
+
+def session() -> "requests.Session":
+    """
+    Returns the process wide pooled session. Auth headers must be passed per request.
+    """
+    global _session
+
+    if _session is None:
+        with _lock:
+            if _session is None:
+                _session = _build_session(_pool_size)
+
+    return _session
+
+
+def api_url(endpoint: str) -> str:
+    # Looked up on every call so the API base can be overridden at runtime
+    return f"{constants.MS_API_BASE}/{endpoint}"
+
+
+def result_url(endpoint: str) -> str:
+    return f"{constants.RESULT_API_BASE}/{endpoint}"
+
+
+def endpoint_key(url: str) -> str:
+    """
+    Groups URLs by endpoint, e.g. `.../report/detail/1234` becomes `.../report/detail/{id}`.
+    """
+    return re.sub(r"/\d+(?=/|$)", "/{id}", url.split("?")[0])
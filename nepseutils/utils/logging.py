@@ -1,48 +1,275 @@
+import atexit
 import logging
+import sys
 import threading
-from queue import Queue
-from time import sleep
+import time
+from logging.handlers import QueueHandler, QueueListener
+from queue import Empty, Full, Queue, SimpleQueue
 
-import requests
+from nepseutils import constants
+from nepseutils.constants import (
+    TELEGRAM_BATCH_DELAY,
+    TELEGRAM_ENQUEUE_TIMEOUT,
+    TELEGRAM_MESSAGE_LIMIT,
+    TELEGRAM_QUEUE_SIZE,
+    TELEGRAM_RATE_LIMIT,
+    TELEGRAM_SHUTDOWN_TIMEOUT,
+)
+from nepseutils.utils import http
+from nepseutils.utils.resilience import TokenBucket
+
+# Telegram limits are per chat, so handlers sending to the same chat share a bucket
+_chat_limiters: dict[str, TokenBucket] = {}
+_chat_limiters_lock = threading.Lock()
+
+# Attempts to send a message before giving up on it
+SEND_ATTEMPTS = 3
+
+LOG_FORMAT = "%(asctime)s %(message)s"
+
+_listener: QueueListener | None = None
+_listener_lock = threading.Lock()
+
+
+def chat_limiter(chat_id: str) -> TokenBucket:
+    with _chat_limiters_lock:
+        if chat_id not in _chat_limiters:
+            _chat_limiters[chat_id] = TokenBucket(TELEGRAM_RATE_LIMIT, 1)
+
+        return _chat_limiters[chat_id]
+
+
+def split_message(message: str, limit: int = TELEGRAM_MESSAGE_LIMIT) -> list[str]:
+    """
+    Splits `message` into chunks of at most `limit` characters, at line breaks where possible.
+    """
+    chunks: list[str] = []
+    current = ""
+
+    for line in message.split("\n"):
+        while len(line) > limit:
+            if current:
+                chunks.append(current)
+                current = ""
+
+            chunks.append(line[:limit])
+            line = line[limit:]
+
+        if current and len(current) + 1 + len(line) > limit:
+            chunks.append(current)
+            current = line
+        else:
+            current = f"{current}\n{line}" if current else line
+
+    if current:
+        chunks.append(current)
+
+    return chunks
 
 
 class TelegramLoggingHandler(logging.Handler):
+    """
+    Sends log records to a Telegram chat from a background thread.
+
+    The sender wakes up when a record is queued, waits briefly to batch records logged
+    together, and POSTs them through the shared keep-alive session, split to fit
+    Telegram's size limit and paced by a per chat rate limit. The queue is bounded: once
+    full, logging blocks briefly and then drops the record, and the number of dropped
+    records is reported in the next message.
+    """
+
     def __init__(self, token: str, chat_id: str):
         super().__init__()
         self.token = token
         self.chat_id = chat_id
-        self.log_queue = Queue()
-        self.flush_interval = 1
-        self.flush_thread = threading.Thread(target=self.flush_logs_periodically)
-        self.flush_thread.daemon = True
+        self.log_queue: Queue[str | None] = Queue(maxsize=TELEGRAM_QUEUE_SIZE)
+        self.dropped = 0
+        self._closed = False
+        self.flush_thread = threading.Thread(target=self.run, name="nepseutils-telegram", daemon=True)
         self.flush_thread.start()
 
-    def send_telegram_message(self, message: str):
-        if self.token and self.chat_id:
+    def send_telegram_message(self, message: str) -> bool:
+        """
+        Sends a message of at most TELEGRAM_MESSAGE_LIMIT characters. Returns whether it was sent.
+        """
+        if not (self.token and self.chat_id):
+            return False
+
+        for attempt in range(1, SEND_ATTEMPTS + 1):
+            chat_limiter(self.chat_id).acquire()
+
             try:
-                requests.get(
-                    f"https://api.telegram.org/bot{self.token}/sendMessage?chat_id={self.chat_id}&text={message}",
+                response = http.session().post(
+                    f"{constants.TELEGRAM_API_BASE}/bot{self.token}/sendMessage",
+                    json={"chat_id": self.chat_id, "text": message},
+                    timeout=10,
                 )
             except Exception as e:
-                print(e)
+                # Logging from here would feed back into this handler
+                print(f"Failed to send Telegram message: {e}", file=sys.stderr)
+                time.sleep(attempt)
+                continue
+
+            if response.status_code == 200:
+                return True
+
+            if response.status_code == 429:
+                try:
+                    retry_after = float(response.json()["parameters"]["retry_after"])
+                except (ValueError, KeyError, TypeError):
+                    retry_after = attempt
+
+                time.sleep(min(retry_after, TELEGRAM_SHUTDOWN_TIMEOUT))
+                continue
+
+            print(f"Telegram rejected message: {response.status_code} {response.text}", file=sys.stderr)
+
+            if response.status_code < 500:
+                return False
+
+            time.sleep(attempt)
+
+        return False
 
     def emit(self, record):
-        log_entry = self.format(record)
-        self.log_queue.put(log_entry)
-
-    def flush_logs_periodically(self):
-        while True:
-            sleep(self.flush_interval)
-            self.flush()
-
-    def flush(self):
-        if not self.log_queue.empty():
-            log_messages = []
-            while not self.log_queue.empty():
-                log_messages.append(self.log_queue.get())
-            batched_log = "\n".join(log_messages)
-            self.send_telegram_message(batched_log)
-
-    def shutdown(self):
-        self.flush()
+        # Records logged while sending, e.g. by urllib3, would otherwise be sent forever
+        if self._closed or record.thread == self.flush_thread.ident:
+            return
+
+        try:
+            self.log_queue.put(self.format(record), timeout=TELEGRAM_ENQUEUE_TIMEOUT)
+        except Full:
+            self.dropped += 1
+        except Exception:
+            self.handleError(record)
+
+    def _next_batch(self) -> tuple[list[str], bool]:
+        """
+        Blocks for the next record, then collects whatever else is logged within the batch
+        delay. Returns the records and whether the handler is shutting down.
+        """
+        first = self.log_queue.get()
+        if first is None:
+            return [], True
+
+        records = [first]
+        deadline = time.monotonic() + TELEGRAM_BATCH_DELAY
+
+        while (remaining := deadline - time.monotonic()) > 0:
+            try:
+                record = self.log_queue.get(timeout=remaining)
+            except Empty:
+                break
+
+            if record is None:
+                return records, True
+
+            records.append(record)
+
+        return records, False
+
+    def run(self):
+        stopping = False
+
+        while not stopping:
+            records, stopping = self._next_batch()
+
+            if self.dropped:
+                dropped, self.dropped = self.dropped, 0
+                records.append(f"{dropped} log messages were dropped since the Telegram queue was full!")
+
+            for chunk in split_message("\n".join(records)):
+                self.send_telegram_message(chunk)
+
+    def flush(self, timeout: float = TELEGRAM_SHUTDOWN_TIMEOUT):
+        """
+        Waits up to `timeout` seconds for queued records to be handed to the sender.
+        """
+        deadline = time.monotonic() + timeout
+
+        while not self.log_queue.empty() and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+    def shutdown(self, timeout: float = TELEGRAM_SHUTDOWN_TIMEOUT):
+        """
+        Sends everything queued so far, giving up after `timeout` seconds.
+        """
+        if self._closed:
+            return
+
+        self._closed = True
+        deadline = time.monotonic() + timeout
+
+        try:
+            self.log_queue.put(None, timeout=timeout)
+        except Full:
+            pass
+
+        self.flush_thread.join(max(0, deadline - time.monotonic()))
+
+        if self.flush_thread.is_alive():
+            lost = self.log_queue.qsize()
+            print(
+                f"Telegram logging did not finish within {timeout} seconds, {lost} messages lost!",
+                file=sys.stderr,
+            )
+
         super().close()
+
+    def close(self):
+        self.shutdown()
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    Queues records without formatting them, leaving that to the listener thread.
+    """
+
+    def prepare(self, record):
+        # Arguments are not changed after being logged, so they can be merged into the message later
+        return record
+
+
+def start_listener(level: int, handler: logging.Handler) -> None:
+    """
+    Routes records at `level` and above to `handler` through a listener thread, so logging
+    threads only pay for queueing them.
+    """
+    global _listener
+
+    stop_listener()
+
+    log_queue: SimpleQueue = SimpleQueue()
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    logging.basicConfig(level=level, force=True, handlers=[DeferredQueueHandler(log_queue)])
+
+    with _listener_lock:
+        _listener = QueueListener(log_queue, handler, respect_handler_level=True)
+        _listener.start()
+
+
+def stop_listener() -> None:
+    """
+    Handles queued records and stops the listener thread. Later records are handled on the
+    thread logging them.
+    """
+    global _listener
+
+    with _listener_lock:
+        listener, _listener = _listener, None
+
+    if listener is None:
+        return
+
+    listener.stop()
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        if isinstance(handler, QueueHandler) and handler.queue is listener.queue:
+            root.removeHandler(handler)
+
+    for handler in listener.handlers:
+        root.addHandler(handler)
+
+
+atexit.register(stop_listener)
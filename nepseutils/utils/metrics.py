@@ -0,0 +1,161 @@
+import json
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from nepseutils.utils.http import endpoint_key
+from nepseutils.utils.writer import atomic_write
+
+# Upper bounds of request latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**values) -> str:
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in values.items()) + "}"
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> list[tuple[str, int]]:
+        """
+        Returns `(upper bound, observations <= bound)` pairs, ending with `+Inf`.
+        """
+        total = 0
+        buckets = []
+
+        for bound, count in zip([*map(str, LATENCY_BUCKETS), "+Inf"], self.counts):
+            total += count
+            buckets.append((bound, total))
+
+        return buckets
+
+    def to_json(self) -> dict:
+        return {"count": self.count, "sum": self.sum, "buckets": dict(self.cumulative())}
+
+
+class MetricsRegistry:
+    """
+    Process wide counters and latency histograms of MeroShare and CDSC requests,
+    labelled by endpoint and by account. Exported as Prometheus text or JSON.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.requests: dict[tuple[str, str, str], int] = defaultdict(int)
+            self.endpoint_latency: dict[str, Histogram] = defaultdict(Histogram)
+            self.account_latency: dict[str, Histogram] = defaultdict(Histogram)
+            self.errors: dict[tuple[str, str], int] = defaultdict(int)
+            self.retries: dict[tuple[str, str], int] = defaultdict(int)
+
+    @staticmethod
+    def endpoint(url: str) -> str:
+        return endpoint_key(urlsplit(url).path)
+
+    def record_request(self, method: str, url: str, status: int, seconds: float, account: str | None) -> None:
+        endpoint = self.endpoint(url)
+
+        with self._lock:
+            self.requests[(endpoint, method, str(status))] += 1
+            self.endpoint_latency[endpoint].observe(seconds)
+            self.account_latency[account or "none"].observe(seconds)
+
+    def record_error(self, url: str, error: str) -> None:
+        with self._lock:
+            self.errors[(self.endpoint(url), error)] += 1
+
+    def record_retry(self, operation: str, account: str | None) -> None:
+        with self._lock:
+            self.retries[(operation, account or "none")] += 1
+
+    def total_latency(self) -> float:
+        """
+        Seconds spent waiting for responses so far, summed over all threads.
+        """
+        with self._lock:
+            return sum(histogram.sum for histogram in self.endpoint_latency.values())
+
+    def to_json(self) -> dict:
+        with self._lock:
+            return {
+                "requests": [
+                    {"endpoint": endpoint, "method": method, "status": status, "count": count}
+                    for (endpoint, method, status), count in self.requests.items()
+                ],
+                "endpoint_latency": {key: value.to_json() for key, value in self.endpoint_latency.items()},
+                "account_latency": {key: value.to_json() for key, value in self.account_latency.items()},
+                "errors": [
+                    {"endpoint": endpoint, "error": error, "count": count}
+                    for (endpoint, error), count in self.errors.items()
+                ],
+                "retries": [
+                    {"operation": operation, "account": account, "count": count}
+                    for (operation, account), count in self.retries.items()
+                ],
+            }
+
+    def to_prometheus(self) -> str:
+        lines = []
+
+        def histogram(name: str, label: str, histograms: dict[str, Histogram]) -> None:
+            lines.append(f"# TYPE {name} histogram")
+            for key, value in histograms.items():
+                for bound, count in value.cumulative():
+                    lines.append(f"{name}_bucket{_labels(**{label: key, 'le': bound})} {count}")
+                lines.append(f"{name}_sum{_labels(**{label: key})} {value.sum}")
+                lines.append(f"{name}_count{_labels(**{label: key})} {value.count}")
+
+        with self._lock:
+            lines.append("# TYPE nepseutils_requests_total counter")
+            for (endpoint, method, status), count in self.requests.items():
+                labels = _labels(endpoint=endpoint, method=method, status=status)
+                lines.append(f"nepseutils_requests_total{labels} {count}")
+
+            histogram("nepseutils_request_duration_seconds", "endpoint", self.endpoint_latency)
+            histogram("nepseutils_account_request_duration_seconds", "account", self.account_latency)
+
+            lines.append("# TYPE nepseutils_request_errors_total counter")
+            for (endpoint, error), count in self.errors.items():
+                labels = _labels(endpoint=endpoint, error=error)
+                lines.append(f"nepseutils_request_errors_total{labels} {count}")
+
+            lines.append("# TYPE nepseutils_retries_total counter")
+            for (operation, account), count in self.retries.items():
+                labels = _labels(operation=operation, account=account)
+                lines.append(f"nepseutils_retries_total{labels} {count}")
+
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: Path) -> None:
+        """
+        Writes metrics to `path`, as JSON if it ends with `.json` and Prometheus text otherwise.
+        """
+        if path.suffix == ".json":
+            data = json.dumps(self.to_json(), indent=2)
+        else:
+            data = self.to_prometheus()
+
+        atomic_write(path, data.encode())
+
+
+registry = MetricsRegistry()
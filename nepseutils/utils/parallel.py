@@ -0,0 +1,75 @@
+import contextvars
+import logging
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any
+
+from nepseutils.constants import DEFAULT_WORKERS
+from nepseutils.utils import profiling, tracing
+
+
+class AccountResult:
+    """
+    Outcome of running a task for a single account.
+    Exactly one of `result` and `error` is meaningful.
+    """
+
+    def __init__(self, account, result: Any = None, error: Exception | None = None) -> None:
+        self.account = account
+        self.result = result
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def run_for_accounts(
+    accounts: Iterable,
+    task: Callable[[Any], Any],
+    workers: int = DEFAULT_WORKERS,
+    on_done: Callable[[AccountResult, int, int], None] | None = None,
+) -> list[AccountResult]:
+    """
+    Runs `task(account)` for every account on a bounded thread pool.
+
+    A failing account never affects the others; its exception is captured in the
+    returned `AccountResult`. `on_done(result, completed, total)` is called from
+    the calling thread as each account finishes. Results are returned in the same
+    order as `accounts`.
+    """
+    accounts = list(accounts)
+    results: list[AccountResult | None] = [None] * len(accounts)
+
+    if not accounts:
+        return []
+
+    task = profiling.wrap(task)
+
+    def traced_task(account):
+        with tracing.span("task", account=getattr(account, "name", None)):
+            return task(account)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(accounts)))) as executor:
+        # Each task runs in a copy of the caller's context so its spans nest under the caller's
+        futures = {
+            executor.submit(contextvars.copy_context().run, traced_task, account): index
+            for index, account in enumerate(accounts)
+        }
+
+        for completed, future in enumerate(as_completed(futures), start=1):
+            index = futures[future]
+            account = accounts[index]
+
+            try:
+                outcome = AccountResult(account, result=future.result())
+            except Exception as e:
+                logging.error("Task failed for user: %s: %s", getattr(account, "name", None), e)
+                outcome = AccountResult(account, error=e)
+
+            results[index] = outcome
+
+            if on_done:
+                on_done(outcome, completed, len(accounts))
+
+    return results  # type: ignore
@@ -0,0 +1,138 @@
+import cProfile
+import io
+import pstats
+import threading
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+from nepseutils.utils.metrics import registry
+from nepseutils.utils.writer import atomic_write
+
+# Breakdown buckets of (module path, function) pairs, each measured as the summed cumulative
+# time of its functions. Functions of a bucket must not call each other.
+BUCKETS = {
+    "Key derivation": (("nepseutils/core/meroshare.py", "derive_key"),),
+    "Loading (JSON and Fernet)": (("nepseutils/core/meroshare.py", "_load"),),
+    "Saving (JSON snapshot)": (("nepseutils/core/meroshare.py", "flush"),),
+    "Encryption and disk writes": (
+        ("nepseutils/utils/writer.py", "atomic_write"),
+        ("cryptography/fernet.py", "encrypt"),
+    ),
+    "Rendering (tabulate)": (("tabulate/__init__.py", "tabulate"),),
+}
+
+# Number of functions listed in the report
+REPORT_LIMIT = 40
+
+
+class ProfileSession:
+    """
+    Profiles the calling thread and every task run through `wrap`, like the worker
+    threads of `run_for_accounts` and writes of the background writer, and merges them
+    into one report.
+    """
+
+    def __init__(self) -> None:
+        self.profiles: list[cProfile.Profile] = []
+        self.threads: set[int] = set()
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+        self.network_wait = 0.0
+        self._lock = threading.Lock()
+
+    def wrap(self, func: Callable) -> Callable:
+        def wrapper(*args, **kwargs):
+            profile = cProfile.Profile()
+
+            with self._lock:
+                self.profiles.append(profile)
+                self.threads.add(threading.get_ident())
+
+            return profile.runcall(func, *args, **kwargs)
+
+        return wrapper
+
+    def run(self, func: Callable, *args, **kwargs) -> Any:
+        global _session
+
+        _session = self
+        network_wait = registry.total_latency()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+
+        try:
+            return self.wrap(func)(*args, **kwargs)
+        finally:
+            self.wall_time = time.perf_counter() - wall_start
+            self.cpu_time = time.process_time() - cpu_start
+            self.network_wait = registry.total_latency() - network_wait
+            _session = None
+
+    def stats(self) -> pstats.Stats:
+        with self._lock:
+            stats = pstats.Stats(self.profiles[0])
+            for profile in self.profiles[1:]:
+                stats.add(profile)
+
+        return stats
+
+    def buckets(self, stats: pstats.Stats) -> dict[str, float]:
+        buckets = dict.fromkeys(BUCKETS, 0.0)
+
+        for (filename, _, function), (_, _, _, cumulative, _) in stats.stats.items():  # type: ignore
+            filename = filename.replace("\\", "/")
+
+            for bucket, functions in BUCKETS.items():
+                if any(filename.endswith(module) and function == name for module, name in functions):
+                    buckets[bucket] += cumulative
+
+        return buckets
+
+    def report(self) -> str:
+        stats = self.stats()
+        output = io.StringIO()
+
+        output.write(f"Wall clock:                 {self.wall_time:10.3f} s\n")
+        output.write(f"CPU (all threads):          {self.cpu_time:10.3f} s\n")
+        output.write(f"Network wait (all threads): {self.network_wait:10.3f} s\n")
+
+        for bucket, seconds in self.buckets(stats).items():
+            output.write(f"{bucket + ':':<28}{seconds:10.3f} s\n")
+
+        output.write(f"\nThreads profiled: {len(self.threads)}\n\n")
+
+        stats.stream = output  # type: ignore
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(REPORT_LIMIT)
+
+        return output.getvalue()
+
+    def write(self, path: Path) -> None:
+        """
+        Writes the text report to `path` and raw stats, for tools like snakeviz, next to it.
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write(path, self.report().encode())
+        self.stats().dump_stats(str(path.with_suffix(".prof")))
+
+
+_session: ProfileSession | None = None
+
+
+def wrap(func: Callable) -> Callable:
+    """
+    Profiles `func` as part of the active session, if any.
+    """
+    return _session.wrap(func) if _session else func
+
+
+def profile(func: Callable, path: Path, *args, **kwargs) -> Any:
+    """
+    Runs `func` under a new profile session and writes its report to `path`.
+    """
+    session = ProfileSession()
+
+    try:
+        return session.run(func, *args, **kwargs)
+    finally:
+        session.write(path)
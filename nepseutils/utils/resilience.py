@@ -0,0 +1,260 @@
+import logging
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import TYPE_CHECKING
+
+from tenacity import retry
+from tenacity.retry import retry_if_exception, retry_if_exception_type
+from tenacity.stop import stop_after_attempt
+from tenacity.wait import wait_random_exponential
+
+from nepseutils.constants import (
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_RESET_TIMEOUT,
+    RATE_LIMIT,
+    RETRY_ATTEMPTS,
+    RETRY_BACKOFF,
+    RETRY_MAX_WAIT,
+)
+from nepseutils.core.errors import CircuitOpen, LocalException
+from nepseutils.utils import http, tracing
+from nepseutils.utils.http import endpoint_key
+from nepseutils.utils.metrics import registry
+
+if TYPE_CHECKING:
+    from requests import Response
+    from tenacity import RetryCallState
+
+
+def _record_retry(retry_state: "RetryCallState") -> None:
+    account = retry_state.args[0] if retry_state.args else None
+    operation = getattr(retry_state.fn, "__qualname__", str(retry_state.fn))
+    registry.record_retry(operation, getattr(account, "name", None))
+
+    error = retry_state.outcome.exception() if retry_state.outcome else None
+    tracing.event(
+        "retry",
+        operation=operation,
+        attempt=retry_state.attempt_number,
+        wait=retry_state.next_action.sleep if retry_state.next_action else None,
+        error=str(error) if error else None,
+    )
+
+
+# Retries failed requests with exponential backoff and full jitter, so accounts running in
+# parallel spread their retries out instead of hitting an overloaded API in lockstep.
+# Connection errors are retried too, requests' exceptions derive from OSError.
+network_retry = retry(
+    stop=stop_after_attempt(RETRY_ATTEMPTS),
+    wait=wait_random_exponential(multiplier=RETRY_BACKOFF, max=RETRY_MAX_WAIT),
+    reraise=True,
+    retry=retry_if_exception_type((LocalException, OSError)),
+    before_sleep=_record_retry,
+)
+
+
+def _not_sent(error: BaseException) -> bool:
+    """
+    Whether a failed request certainly did not reach the server, so sending it again can
+    not submit it twice.
+    """
+    if isinstance(error, LocalException):
+        return True
+
+    from requests.exceptions import ConnectionError, ConnectTimeout
+    from urllib3.exceptions import NewConnectionError
+
+    if isinstance(error, ConnectTimeout):
+        return True
+
+    if isinstance(error, ConnectionError) and error.args:
+        return isinstance(getattr(error.args[0], "reason", None), NewConnectionError)
+
+    return False
+
+
+# Retries requests which are not idempotent, like applying. Failed responses and failures
+# to connect are retried, but not read timeouts or dropped connections since the server may
+# have accepted the request already.
+submit_retry = retry(
+    stop=stop_after_attempt(RETRY_ATTEMPTS),
+    wait=wait_random_exponential(multiplier=RETRY_BACKOFF, max=RETRY_MAX_WAIT),
+    reraise=True,
+    retry=retry_if_exception(_not_sent),
+    before_sleep=_record_retry,
+)
+
+
+class TokenBucket:
+    """
+    Allows `rate` acquisitions per second on average and bursts of up to `capacity`.
+    `acquire` blocks until a token is available.
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+            # Reserve the token now and sleep off the debt outside the lock
+            self._tokens -= 1
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0
+
+        if delay:
+            time.sleep(delay)
+
+
+class CircuitBreaker:
+    """
+    Fails fast once an endpoint keeps failing.
+
+    After `failure_threshold` consecutive failures the circuit opens and requests raise
+    `CircuitOpen` without being sent. After `reset_timeout` seconds one trial request is
+    let through; its success closes the circuit and its failure opens it again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def open(self) -> bool:
+        return self.opened_at is not None
+
+    def before(self) -> None:
+        with self._lock:
+            if self.opened_at is None:
+                return
+
+            if self._trial or time.monotonic() - self.opened_at < self.reset_timeout:
+                raise CircuitOpen(f"{self.name} is failing, not sending request!")
+
+            self._trial = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.opened_at is not None:
+                logging.info("Circuit closed for %s", self.name)
+
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._trial = False
+
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logging.warning("Circuit opened for %s after %s failures", self.name, self.failures)
+
+                self.opened_at = time.monotonic()
+
+
+_limiter = TokenBucket(RATE_LIMIT, RATE_LIMIT * 2)
+_limiter_override: ContextVar[TokenBucket | None] = ContextVar("nepseutils_limiter", default=None)
+_breakers: dict[str, CircuitBreaker] = {}
+_lock = threading.Lock()
+
+
+def configure(rate: float = RATE_LIMIT, burst: float | None = None) -> None:
+    """
+    Sets the process wide request rate shared by all accounts. A rate of 0 disables it.
+    Bursts default to twice the rate.
+    """
+    global _limiter
+    _limiter = TokenBucket(rate, burst or rate * 2)
+
+
+@contextmanager
+def use_limiter(limiter: TokenBucket) -> Iterator[TokenBucket]:
+    """
+    Paces requests sent inside the block, including from `run_for_accounts` workers started
+    in it, with `limiter` instead of the process wide rate limit.
+    """
+    token = _limiter_override.set(limiter)
+
+    try:
+        yield limiter
+    finally:
+        _limiter_override.reset(token)
+
+
+def reset() -> None:
+    """
+    Closes every circuit.
+    """
+    with _lock:
+        _breakers.clear()
+
+
+def circuit_breaker(key: str) -> CircuitBreaker:
+    with _lock:
+        breaker = _breakers.get(key)
+
+        if breaker is None:
+            breaker = _breakers[key] = CircuitBreaker(key, CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT)
+
+        return breaker
+
+
+def send(method: str, url: str, account: str | None = None, **kwargs) -> "Response":
+    """
+    Sends a request through the shared session, subject to the process wide rate limit
+    and the circuit breaker of its endpoint. Server errors and throttling count as
+    failures, client errors like a rejected login do not.
+
+    Every request is recorded in the metrics registry and traced, labelled with `account`.
+    """
+    with tracing.span(
+        "http", method=method, endpoint=registry.endpoint(url), account=account
+    ) as request_span:
+        breaker = circuit_breaker(endpoint_key(url))
+
+        try:
+            breaker.before()
+        except CircuitOpen:
+            registry.record_error(url, "CircuitOpen")
+            raise
+
+        (_limiter_override.get() or _limiter).acquire()
+
+        start = time.perf_counter()
+        try:
+            response = http.session().request(method, url, **kwargs)
+        except Exception as e:
+            breaker.record_failure()
+            registry.record_error(url, type(e).__name__)
+            raise
+
+        registry.record_request(method, url, response.status_code, time.perf_counter() - start, account)
+
+        if request_span:
+            request_span.set(status=response.status_code)
+
+        if response.status_code >= 500 or response.status_code == 429:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+
+        return response
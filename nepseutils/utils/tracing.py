@@ -0,0 +1,235 @@
+"""
+Lightweight tracing of per-account operations.
+
+Spans nest through context variables, including across `run_for_accounts` worker threads,
+and carry account and endpoint attributes plus events like retries. Finished spans are
+appended to a JSONL file once `configure` is called; otherwise tracing is a no-op.
+
+View a trace with `python -m nepseutils.utils.tracing FILE`, or convert it to folded
+stacks for flame graph tools with `--folded`.
+"""
+
+import argparse
+import functools
+import json
+import os
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "attributes", "events", "start", "end", "error")
+
+    def __init__(self, name: str, parent: "Span | None", attributes: dict) -> None:
+        self.span_id = os.urandom(8).hex()
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.name = name
+        self.attributes = attributes
+        self.events: list[dict] = []
+        self.start = time.time()
+        self.end: float | None = None
+        self.error: str | None = None
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def event(self, name: str, **attributes) -> None:
+        self.events.append({"name": name, "time": time.time(), **attributes})
+
+    def to_json(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "end": self.end,
+            "duration": (self.end or self.start) - self.start,
+            "thread": threading.current_thread().name,
+            "attributes": self.attributes,
+            "events": self.events,
+            "error": self.error,
+        }
+
+
+class JsonlExporter:
+    def __init__(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.file = open(path, "a", buffering=1)
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_json(), default=str)
+
+        with self._lock:
+            self.file.write(line + "\n")
+
+    def close(self) -> None:
+        with self._lock:
+            self.file.close()
+
+
+_current: ContextVar[Span | None] = ContextVar("nepseutils_span", default=None)
+_exporter: JsonlExporter | None = None
+
+
+def configure(path: Path | None) -> None:
+    """
+    Starts writing spans to `path`, or stops tracing if it is None.
+    """
+    global _exporter
+
+    if _exporter:
+        _exporter.close()
+
+    _exporter = JsonlExporter(path) if path else None
+
+
+def enabled() -> bool:
+    return _exporter is not None
+
+
+def current() -> Span | None:
+    return _current.get()
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Span | None]:
+    if _exporter is None:
+        yield None
+        return
+
+    new_span = Span(name, _current.get(), attributes)
+    token = _current.set(new_span)
+
+    try:
+        yield new_span
+    except BaseException as e:
+        new_span.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        new_span.end = time.time()
+
+        exporter = _exporter
+        if exporter:
+            exporter.export(new_span)
+
+
+def event(name: str, **attributes) -> None:
+    """
+    Adds an event to the current span, if any.
+    """
+    current_span = _current.get()
+
+    if current_span is not None:
+        current_span.event(name, **attributes)
+
+
+def traced(func: Callable) -> Callable:
+    """
+    Runs a method in a span named after it, with the `account` attribute set from `self.name`.
+    """
+    name = func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        if _exporter is None:
+            return func(self, *args, **kwargs)
+
+        with span(name, account=getattr(self, "name", None)):
+            return func(self, *args, **kwargs)
+
+    return wrapper
+
+
+def read(path: Path) -> list[dict]:
+    with open(path) as trace_file:
+        return [json.loads(line) for line in trace_file if line.strip()]
+
+
+def timeline(spans: list[dict]) -> str:
+    """
+    Renders spans as an indented tree per trace, with start offsets and duration bars.
+    """
+    children: dict[str | None, list[dict]] = {}
+    for trace_span in spans:
+        children.setdefault(trace_span["parent_id"], []).append(trace_span)
+
+    lines = []
+
+    def render(trace_span: dict, depth: int, origin: float, total: float) -> None:
+        offset = trace_span["start"] - origin
+        bar_start = int(offset / total * 40) if total else 0
+        bar_length = max(1, int(trace_span["duration"] / total * 40)) if total else 1
+        bar = " " * bar_start + "#" * bar_length
+
+        attributes = ", ".join(
+            f"{key}={value}" for key, value in trace_span["attributes"].items() if value is not None
+        )
+        retries = sum(1 for trace_event in trace_span["events"] if trace_event["name"] == "retry")
+        suffix = f" retries={retries}" if retries else ""
+        suffix += f" ERROR {trace_span['error']}" if trace_span["error"] else ""
+
+        lines.append(
+            f"{offset * 1000:9.1f} {trace_span['duration'] * 1000:9.1f} ms |{bar:<41}| "
+            f"{'  ' * depth}{trace_span['name']} {attributes}{suffix}"
+        )
+
+        for child in sorted(children.get(trace_span["span_id"], []), key=lambda item: item["start"]):
+            render(child, depth + 1, origin, total)
+
+    for root in sorted(children.get(None, []), key=lambda item: item["start"]):
+        render(root, 0, root["start"], root["duration"])
+        lines.append("")
+
+    return "\n".join(lines)
+
+
+def folded(spans: list[dict]) -> str:
+    """
+    Renders spans as folded stacks with self time in microseconds, for flame graph tools.
+    """
+    by_id = {trace_span["span_id"]: trace_span for trace_span in spans}
+    child_time: dict[str, float] = {}
+
+    for trace_span in spans:
+        parent_id = trace_span["parent_id"]
+        if parent_id:
+            child_time[parent_id] = child_time.get(parent_id, 0) + trace_span["duration"]
+
+    stacks: dict[str, int] = {}
+
+    for trace_span in spans:
+        names = []
+        node = trace_span
+
+        while node:
+            names.append(node["name"])
+            node = by_id.get(node["parent_id"])
+
+        # Children running in parallel can add up to more than their parent
+        self_time = max(0, trace_span["duration"] - child_time.get(trace_span["span_id"], 0))
+        stack = ";".join(reversed(names))
+        stacks[stack] = stacks.get(stack, 0) + int(self_time * 1_000_000)
+
+    return "\n".join(f"{stack} {value}" for stack, value in stacks.items())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show a nepseutils trace")
+    parser.add_argument("file", type=Path, help="JSONL trace written with --trace")
+    parser.add_argument("--folded", action="store_true", help="Print folded stacks for flame graphs")
+    args = parser.parse_args()
+
+    spans = read(args.file)
+    print(folded(spans) if args.folded else timeline(spans))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import atexit
+import logging
+import os
+import threading
+from collections.abc import Callable
+from pathlib import Path
+
+
+def atomic_write(path: Path, data: bytes) -> None:
+    """
+    Writes `data` to a temporary file next to `path`, fsyncs it and renames it into place,
+    so a crash leaves either the old or the new file but never a truncated one.
+    """
+    temp_path = path.with_name(f".{path.name}.tmp")
+
+    with open(temp_path, "wb") as temp_file:
+        temp_file.write(data)
+        temp_file.flush()
+        os.fsync(temp_file.fileno())
+
+    os.replace(temp_path, path)
+
+    if os.name != "nt":
+        directory_fd = os.open(path.parent, os.O_RDONLY)
+        try:
+            os.fsync(directory_fd)
+        finally:
+            os.close(directory_fd)
+
+
+class WriteBehindWriter:
+    """
+    Writes files on a background thread.
+
+    Each submitted job is a callable producing the bytes to write, so expensive work like
+    encryption also happens off the calling thread. Jobs for the same path are merged and
+    only the latest one is written. Jobs are written in the order they were last submitted.
+    """
+
+    def __init__(self) -> None:
+        self._pending: dict[Path, Callable[[], bytes] | None] = {}
+        self._condition = threading.Condition()
+        self._busy = False
+        self._closed = False
+        self._error: Exception | None = None
+        self._thread: threading.Thread | None = None
+
+        atexit.register(self.close)
+
+    def submit(self, path: Path, producer: Callable[[], bytes]) -> None:
+        self._enqueue(path, producer)
+
+    def delete(self, path: Path) -> None:
+        self._enqueue(path, None)
+
+    def _enqueue(self, path: Path, producer: Callable[[], bytes] | None) -> None:
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Writer has already been closed!")
+
+            # Move to the end so files depending on earlier ones are still written after them
+            self._pending.pop(path, None)
+            self._pending[path] = producer
+
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="nepseutils-writer", daemon=True)
+                self._thread.start()
+
+            self._condition.notify_all()
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """
+        Blocks until every submitted job has been written.
+        Returns False if `timeout` expired first. Raises the last write error, if any.
+        """
+        with self._condition:
+            done = self._condition.wait_for(lambda: not self._pending and not self._busy, timeout)
+
+            if self._error:
+                error, self._error = self._error, None
+                raise error
+
+            return done
+
+    def close(self, timeout: float | None = None) -> None:
+        try:
+            self.flush(timeout)
+        finally:
+            with self._condition:
+                self._closed = True
+                self._condition.notify_all()
+
+            if self._thread is not None and self._thread is not threading.current_thread():
+                self._thread.join(timeout)
+
+            atexit.unregister(self.close)
+
+    def _run(self) -> None:
+        # Imported here since profiling writes its reports with this module
+        from nepseutils.utils import profiling
+
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending or self._closed)
+
+                if not self._pending and self._closed:
+                    return
+
+                jobs = list(self._pending.items())
+                self._pending.clear()
+                self._busy = True
+
+            profiling.wrap(self._write)(jobs)
+
+            with self._condition:
+                self._busy = False
+                self._condition.notify_all()
+
+    def _write(self, jobs: list[tuple[Path, Callable[[], bytes] | None]]) -> None:
+        for path, producer in jobs:
+            try:
+                if producer is None:
+                    path.unlink(missing_ok=True)
+                else:
+                    atomic_write(path, producer())
+            except Exception as e:
+                logging.error("Failed to write %s: %s", path, e)
+                with self._condition:
+                    self._error = e
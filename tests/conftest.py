@@ -0,0 +1,67 @@
+import functools
+
+import pytest
+
+from nepseutils import constants
+from nepseutils.core.account import Account
+from nepseutils.core.meroshare import MeroShare
+from nepseutils.utils import resilience
+from nepseutils.utils.fake_server import FakeAccount, FakeIssue, FakeMeroShareServer
+
+
+def make_account(index: int) -> Account:
+    return Account(f"13010000{index:08d}", "password", 1234, 1, "crn")
+
+
+@functools.lru_cache
+def fernet(password: str):
+    # Key derivation is deliberately slow, derive each password once per test run
+    return MeroShare.fernet_init(password)
+
+
+@pytest.fixture
+def fake_server(monkeypatch, tmp_path):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    resilience.reset()
+
+    with FakeMeroShareServer() as server:
+        monkeypatch.setattr(constants, "MS_API_BASE", server.api_base)
+        monkeypatch.setattr(constants, "RESULT_API_BASE", server.result_base)
+
+        for index in range(1, 4):
+            server.add_account(FakeAccount(f"13010000{index:08d}", "password", f"Account {index}"))
+
+        server.add_issue(FakeIssue(101, "FAKE", "Fake Hydropower Limited", min_unit=10))
+        yield server
+
+
+@pytest.fixture
+def meroshare(tmp_path):
+    """
+    Builds MeroShare instances with `accounts`, or the first `count` fake server accounts,
+    and closes them after the test.
+    """
+    instances: list[MeroShare] = []
+
+    def make(
+        accounts: list[Account] | None = None,
+        count: int = 1,
+        password: str = "secret",
+        config_path=None,
+    ) -> MeroShare:
+        if accounts is None:
+            accounts = [make_account(index) for index in range(1, count + 1)]
+
+        ms = MeroShare(
+            fernet=fernet(password),
+            accounts=accounts,
+            capitals={"13010": 1},
+            config_path=config_path or tmp_path / "config.json",
+        )
+        instances.append(ms)
+        return ms
+
+    yield make
+
+    for ms in instances:
+        ms.close()
@@ -0,0 +1,212 @@
+import time
+
+import pytest
+
+from nepseutils.constants import RETRY_ATTEMPTS, TOKEN_IDLE_TIMEOUT, TOKEN_MAX_AGE
+from nepseutils.core import account as account_module
+from nepseutils.core.account import Account
+from nepseutils.core.errors import LocalException
+from nepseutils.core.issue import Issue
+from nepseutils.core.meroshare import MeroShare
+from nepseutils.utils.fake_server import FakeIssue
+from tests.conftest import make_account
+
+
+def test_get_details(fake_server):
+    account = make_account(1)
+    account.get_details()
+
+    assert account.name == "Account 1"
+    assert account.account == "0000000000000001"
+    assert (account.bank_id, account.branch_id, account.customer_id) == (44, 55, 66)
+
+
+def test_apply_and_fetch_status(fake_server):
+    account = make_account(2)
+
+    result = account.apply(share_id=101, quantity=10)
+    assert result["status"] == "CREATED"
+    assert [issue.symbol for issue in account.issues] == ["FAKE"]
+
+    fake_server.set_result(101, account.dmat, "Alloted", 10)
+    account.fetch_applied_issues_status()
+
+    assert account.issues[0].alloted is True
+    assert account.issues[0].alloted_quantity == 10
+
+    assert account.apply(share_id=101, quantity=10)["message"] == "Issue already applied!"
+
+
+def test_status_is_fetched_for_every_issue_of_a_company(fake_server):
+    account = make_account(3)
+    account.apply(share_id=101, quantity=10)
+
+    # An earlier application of the same company under another entry, e.g. rejected and applied again
+    form_id = account.issues[0].applicant_form_id
+    account.issues.append(Issue("FAKE", "FAKE-OLD", "TRANSACTION_SUCCESS", "IPO", 101, form_id))
+
+    fake_server.set_result(101, account.dmat, "Alloted", 10)
+    account.fetch_applied_issues_status(company_id=101)
+
+    assert [issue.alloted for issue in account.issues] == [True, True]
+
+
+def test_application_reports_are_paginated_and_incremental(fake_server, monkeypatch):
+    monkeypatch.setattr(account_module, "REPORT_PAGE_SIZE", 2)
+    search = ("POST", "/api/meroShare/applicantForm/active/search/")
+    migrated_search = ("POST", "/api/meroShare/migrated/applicantForm/search/")
+
+    account = make_account(1)
+    for share_id in (102, 103, 104):
+        fake_server.add_issue(FakeIssue(share_id, f"FAKE{share_id}", "Fake Limited"))
+        account.apply(share_id=share_id, quantity=10)
+
+    account.fetch_applied_issues(refetch=True)
+    assert len(account.issues) == 3
+    assert account.last_applicant_form_id == account.issues.by_symbol("FAKE104").applicant_form_id
+
+    requests = fake_server.requests[search]
+    migrated_requests = fake_server.requests[migrated_search]
+    account.fetch_applied_issues()
+    assert fake_server.requests[search] == requests + 1
+    assert fake_server.requests[migrated_search] == migrated_requests
+    assert len(account.issues) == 3
+
+
+def test_failed_report_page_is_fetched_again(fake_server, monkeypatch):
+    monkeypatch.setattr(account_module, "REPORT_PAGE_SIZE", 10)
+
+    account = make_account(1)
+    for share_id in range(200, 225):
+        fake_server.add_issue(FakeIssue(share_id, f"FAKE{share_id}", "Fake Limited"))
+        account.apply(share_id=share_id, quantity=10)
+
+    fetch_page = Account.fetch_application_report_page
+
+    def failing_fetch_page(self, active=True, page=1, size=None):
+        if active and page == 2:
+            raise LocalException("Recent application list request failed!")
+        return fetch_page(self, active, page, size)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(Account, "fetch_application_report_page", failing_fetch_page)
+        with pytest.raises(LocalException):
+            account.fetch_applied_issues(refetch=True)
+
+    assert account.last_applicant_form_id is None
+
+    account.fetch_applied_issues()
+    assert len(account.issues) == 25
+    assert account.last_applicant_form_id == account.issues.by_symbol("FAKE224").applicant_form_id
+
+
+def test_rejected_apply_is_not_resubmitted_recursively(fake_server):
+    apply_post = ("POST", "/api/meroShare/applicantForm/share/apply")
+    applicable_post = ("POST", "/api/meroShare/companyShare/applicableIssue/")
+
+    account = make_account(1)
+    account.ensure_details()
+    account.crn = ""
+    issue = account.find_applicable_issue(101)
+
+    with pytest.raises(LocalException):
+        account.apply(share_id=101, quantity=10, issue=issue)
+
+    assert fake_server.requests[apply_post] == RETRY_ATTEMPTS
+    assert fake_server.requests[applicable_post] == 2
+
+
+def test_expired_token_is_renewed(fake_server):
+    account = make_account(1)
+    account.login()
+    logins = fake_server.requests[("POST", "/api/meroShare/auth/")]
+
+    fake_server.expire_tokens()
+    account.fetch_applicable_issues()
+
+    assert fake_server.requests[("POST", "/api/meroShare/auth/")] == logins + 1
+
+
+def test_cached_token_expires_when_idle_or_too_old(fake_server):
+    login = ("POST", "/api/meroShare/auth/")
+    account = make_account(1)
+    account.login()
+    assert account.token_valid_until == account.token_issued_at + TOKEN_IDLE_TIMEOUT
+
+    account.fetch_applicable_issues()
+    assert fake_server.requests[login] == 1
+
+    # Idle for too long
+    account.token_last_used = time.time() - TOKEN_IDLE_TIMEOUT - 1
+    account.fetch_applicable_issues()
+    assert fake_server.requests[login] == 2
+
+    # Used recently, but close to the maximum age since login
+    account.token_issued_at = time.time() - TOKEN_MAX_AGE + 60
+    account.fetch_applicable_issues()
+    assert account.token_valid_until == account.token_issued_at + TOKEN_MAX_AGE
+    assert fake_server.requests[login] == 2
+
+    # Used recently, but logged in too long ago
+    account.token_issued_at = time.time() - TOKEN_MAX_AGE - 1
+    account.token_last_used = time.time()
+    account.fetch_applicable_issues()
+    assert fake_server.requests[login] == 3
+
+
+def test_persisted_token_is_reused_after_reload(fake_server, meroshare):
+    ms = meroshare()
+    ms.accounts[0].login()
+    ms.save_data()
+    ms.close()
+
+    reloaded = MeroShare.load("secret", ms.config_path)
+    try:
+        reloaded.accounts[0].fetch_applicable_issues()
+    finally:
+        reloaded.close()
+
+    assert reloaded.accounts[0].auth_token == ms.accounts[0].auth_token
+    assert fake_server.requests[("POST", "/api/meroShare/auth/")] == 1
+
+
+def test_sync_isolates_failing_accounts(fake_server, meroshare):
+    broken = make_account(3)
+    broken.password = "wrong"
+
+    ms = meroshare([make_account(1), make_account(2), broken])
+    results = ms.sync(workers=3)
+
+    assert [result.ok for result in results] == [True, True, False]
+
+
+def test_bulk_apply_shares_applicable_issues(fake_server, meroshare):
+    ms = meroshare(count=3)
+    results = ms.apply(share_id=101, quantity=10, workers=3)
+
+    assert all(result.result["status"] == "CREATED" for result in results)
+    assert fake_server.requests[("POST", "/api/meroShare/companyShare/applicableIssue/")] == 1
+
+
+def test_min_apply_unit_is_cached_on_disk(fake_server, meroshare):
+    ms = meroshare()
+
+    assert ms.min_apply_unit(101) == 10
+    assert ms.min_apply_unit(101) == 10
+    ms.close()
+
+    reloaded = meroshare()
+    assert reloaded.min_apply_unit(101) == 10
+    assert fake_server.requests[("GET", "/api/meroShare/active/{id}")] == 1
+
+
+def test_armed_apply_fires_without_fetching_issues(fake_server, meroshare):
+    ms = meroshare(count=3)
+
+    fire_at = time.time() + 0.5
+    results = ms.arm(share_id=101, quantity=10, fire_at=fire_at, workers=3)
+
+    assert all(result.ok and result.result[0]["status"] == "CREATED" for result in results)
+    assert all(result.result[1] >= 0 for result in results)
+    assert fake_server.requests[("POST", "/api/meroShare/companyShare/applicableIssue/")] == 0
+    assert all(account.issues.by_company_share_id(101) for account in ms.accounts)
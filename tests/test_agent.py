@@ -0,0 +1,88 @@
+import stat
+import sys
+import threading
+import time
+
+from nepseutils.__main__ import NepseUtils, main
+from nepseutils.core.meroshare import SEGMENT_DIRECTORY, MeroShare
+from nepseutils.utils import agent
+from nepseutils.utils.agent import AgentClient, UnlockAgent
+
+
+def serve(unlock_agent: UnlockAgent, socket_path) -> threading.Thread:
+    thread = threading.Thread(target=unlock_agent.serve, args=(socket_path,), daemon=True)
+    thread.start()
+
+    deadline = time.monotonic() + 5
+    while not socket_path.exists() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    return thread
+
+
+def test_socket_is_private_and_lock_stops_agent(tmp_path):
+    socket_path = tmp_path / "agent.sock"
+    thread = serve(UnlockAgent(MeroShare.derive_key("secret"), tmp_path), socket_path)
+
+    assert stat.S_IMODE(socket_path.stat().st_mode) == 0o600
+
+    client = AgentClient(socket_path)
+    assert client.available()
+    assert client.key() == MeroShare.derive_key("secret")
+
+    client.lock()
+    thread.join(5)
+
+    assert not thread.is_alive()
+    assert not socket_path.exists()
+
+
+def test_agent_locks_itself_when_idle(tmp_path):
+    socket_path = tmp_path / "agent.sock"
+    thread = serve(UnlockAgent(MeroShare.derive_key("secret"), tmp_path, lock_timeout=0.1), socket_path)
+
+    thread.join(5)
+
+    assert not thread.is_alive()
+    assert not AgentClient(socket_path).available()
+
+
+def test_lock_flag_stops_running_agent(tmp_path, monkeypatch, capsys):
+    socket_path = tmp_path / "agent.sock"
+    monkeypatch.setenv(agent.AGENT_SOCKET_ENV, str(socket_path))
+    thread = serve(UnlockAgent(MeroShare.derive_key("secret"), tmp_path), socket_path)
+
+    monkeypatch.setattr(sys, "argv", ["nepseutils", "--lock"])
+    main()
+    thread.join(5)
+
+    assert not thread.is_alive()
+    assert "Unlock agent locked!" in capsys.readouterr().out
+
+
+def test_stale_agent_falls_back_to_password(tmp_path, monkeypatch, meroshare):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    socket_path = tmp_path / "agent.sock"
+    monkeypatch.setenv(agent.AGENT_SOCKET_ENV, str(socket_path))
+
+    ms = meroshare(password="old password", config_path=MeroShare.default_config_path())
+    ms.save_data()
+    ms.close()
+    segment_directory = ms.config_path.parent / SEGMENT_DIRECTORY
+    thread = serve(UnlockAgent(MeroShare.derive_key("old password"), segment_directory), socket_path)
+
+    # Changing the password re-keys the data without the agent knowing
+    ms = MeroShare.load("old password")
+    ms.fernet = MeroShare.fernet_init("new password")
+    ms.save_data()
+    ms.close()
+
+    monkeypatch.setattr("nepseutils.__main__.getpass", lambda prompt: "new password")
+    cli = NepseUtils()
+    cli.preloop()
+    cli.ms.close()
+
+    thread.join(5)
+
+    assert [account.dmat for account in cli.ms.accounts] == ["1301000000000001"]
+    assert not thread.is_alive()
@@ -0,0 +1,26 @@
+from nepseutils.core.issue import Issue, IssueStore
+
+
+def make_issue(share_id: int, symbol: str, form_id: int) -> Issue:
+    return Issue(symbol, symbol, "TRANSACTION_SUCCESS", "IPO", share_id, form_id)
+
+
+def test_issue_store_lookups_and_serialization():
+    store = IssueStore([make_issue(1, "AAA", 10), make_issue(2, "BBB", 20)])
+
+    assert store.by_company_share_id("2").symbol == "BBB"
+    assert store.by_symbol("AAA").applicant_form_id == 10
+    assert store.by_applicant_form_id(20).company_share_id == 2
+    assert store.by_symbol("CCC") is None
+    assert store.all_by_company_share_id(3) == []
+    assert not hasattr(store[0], "__dict__")
+
+    existing = store.upsert(make_issue(3, "AAA", 30))
+    assert existing.company_share_id == 1
+    assert len(store) == 2
+
+    store.append(make_issue(2, "BBB2", 40))
+    assert store.by_company_share_id(2).symbol == "BBB"
+    assert [issue.symbol for issue in store.all_by_company_share_id("2")] == ["BBB", "BBB2"]
+
+    assert IssueStore(Issue.from_json(issue) for issue in store.to_json()).to_json() == store.to_json()
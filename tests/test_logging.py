@@ -0,0 +1,56 @@
+import logging
+import threading
+
+from nepseutils import constants
+from nepseutils.utils.logging import TelegramLoggingHandler, split_message, start_listener, stop_listener
+
+
+def test_split_message():
+    assert split_message("short") == ["short"]
+    assert split_message("aaa\nbbb\nccc", limit=7) == ["aaa\nbbb", "ccc"]
+    assert split_message("x" * 10, limit=4) == ["xxxx", "xxxx", "xx"]
+
+
+def test_telegram_handler_sends_batched_chunks(fake_server, monkeypatch):
+    monkeypatch.setattr(constants, "TELEGRAM_API_BASE", fake_server.base_url)
+
+    handler = TelegramLoggingHandler("token", "chat")
+    logger = logging.getLogger("nepseutils.test_telegram")
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+    try:
+        logger.info("Applied for FAKE!")
+        logger.info("line\n" * 1000)
+    finally:
+        logger.removeHandler(handler)
+        handler.shutdown()
+
+    messages = [text for chat_id, text in fake_server.telegram_messages if chat_id == "chat"]
+
+    assert len(messages) > 1
+    assert all(len(message) <= constants.TELEGRAM_MESSAGE_LIMIT for message in messages)
+    assert messages[0].startswith("Applied for FAKE!")
+
+
+def test_listener_handles_records_off_thread():
+    threads = []
+
+    class RecordingHandler(logging.Handler):
+        def emit(self, record):
+            threads.append((threading.current_thread(), self.format(record)))
+
+    handler = RecordingHandler()
+    start_listener(logging.INFO, handler)
+
+    try:
+        logging.debug("Filtered %s", "out")
+        logging.info("Fetching application reports page %s for user: %s", 1, "Account 1")
+    finally:
+        stop_listener()
+        logging.getLogger().removeHandler(handler)
+
+    assert len(threads) == 1
+    thread, message = threads[0]
+    assert thread is not threading.current_thread()
+    assert message.endswith("Fetching application reports page 1 for user: Account 1")
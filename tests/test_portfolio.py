@@ -0,0 +1,27 @@
+from nepseutils.core.portfolio import Portfolio, PortfolioEntry
+
+
+def make_portfolio(*entries: tuple[str, float, float, float]) -> Portfolio:
+    portfolio_entries = [
+        PortfolioEntry(balance, ltp, closing, script, script, balance * ltp, balance * closing)
+        for script, balance, ltp, closing in entries
+    ]
+    return Portfolio(portfolio_entries, len(portfolio_entries), *Portfolio.totals(portfolio_entries))
+
+
+def test_aggregate_merges_same_scrip():
+    first = make_portfolio(("AAA", 10, 110, 100), ("BBB", 5, 0, 0))
+    second = make_portfolio(("AAA", 20, 110, 100))
+
+    combined = Portfolio.aggregate([first, second])
+    by_script = {entry.script: entry for entry in combined.entries}
+
+    assert by_script["AAA"].current_balance == 30
+    assert by_script["AAA"].value_as_of_last_transaction_price == 3300
+    assert combined.total_value_as_of_previous_closing_price == 3000
+    assert first.entries[0].current_balance == 10
+    assert dict(zip(by_script, combined.changes())) == {"AAA": (300, 10), "BBB": (0, 0)}
+
+    groups = Portfolio.aggregate_by([("a", first), ("b", second), ("a", second)])
+    assert groups["a"].total_value_as_of_last_transaction_price == 3300
+    assert groups["b"].total_items == 1
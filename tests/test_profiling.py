@@ -0,0 +1,62 @@
+import io
+import json
+import threading
+
+from nepseutils.utils import profiling
+from nepseutils.utils.parallel import run_for_accounts
+
+
+def test_profile_includes_worker_threads(tmp_path):
+    # Every task waits for the others, so each runs on its own worker thread
+    barrier = threading.Barrier(3)
+
+    def work():
+        return run_for_accounts(range(3), lambda index: barrier.wait(5), workers=3)
+
+    results = profiling.profile(work, tmp_path / "profile.txt")
+
+    assert all(result.ok for result in results)
+    report = (tmp_path / "profile.txt").read_text()
+    assert "Threads profiled: 4" in report
+    assert "Network wait" in report
+    assert (tmp_path / "profile.prof").exists()
+
+
+def test_buckets_match_module_and_function(fake_server, meroshare):
+    ms = meroshare()
+
+    def save():
+        json.load(io.StringIO("{}"))
+        ms.save_data()
+        ms.wait_for_writes()
+
+    session = profiling.ProfileSession()
+    session.run(save)
+
+    buckets = session.buckets(session.stats())
+    assert buckets["Loading (JSON and Fernet)"] == 0
+    assert buckets["Saving (JSON snapshot)"] > 0
+    assert buckets["Encryption and disk writes"] > 0
+    assert len(session.threads) == 2
+
+
+def test_profile_command_includes_saves(fake_server, meroshare, monkeypatch):
+    from nepseutils.__main__ import NepseUtils
+
+    sessions = []
+    write = profiling.ProfileSession.write
+
+    def capture(self, path):
+        sessions.append(self)
+        write(self, path)
+
+    monkeypatch.setattr(profiling.ProfileSession, "write", capture)
+
+    cli = NepseUtils()
+    cli.ms = meroshare()
+    cli.onecmd("profile telegram disable")
+
+    [session] = sessions
+    buckets = session.buckets(session.stats())
+    assert buckets["Saving (JSON snapshot)"] > 0
+    assert buckets["Encryption and disk writes"] > 0
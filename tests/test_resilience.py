@@ -0,0 +1,105 @@
+import time
+
+import pytest
+import requests
+
+from nepseutils.core.account import Account
+from nepseutils.core.errors import CircuitOpen, LocalException
+from nepseutils.utils import http, resilience
+from nepseutils.utils.metrics import registry
+from nepseutils.utils.resilience import CircuitBreaker, TokenBucket, endpoint_key
+
+
+def test_circuit_breaker_opens_and_recovers():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=0.05)
+
+    breaker.record_failure()
+    breaker.before()
+    breaker.record_failure()
+
+    with pytest.raises(CircuitOpen):
+        breaker.before()
+
+    time.sleep(0.06)
+    breaker.before()
+
+    # Only one trial request is let through while half open
+    with pytest.raises(CircuitOpen):
+        breaker.before()
+
+    breaker.record_success()
+    breaker.before()
+    assert not breaker.open
+
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=100, capacity=1)
+
+    start = time.monotonic()
+    for _ in range(6):
+        bucket.acquire()
+
+    assert time.monotonic() - start >= 0.045
+
+
+def test_endpoint_key_groups_ids():
+    assert endpoint_key("https://x/api/meroShare/applicantForm/report/detail/1234") == (
+        "https://x/api/meroShare/applicantForm/report/detail/{id}"
+    )
+
+
+def test_requests_are_recorded_in_metrics(fake_server, tmp_path):
+    registry.reset()
+    Account("1301000000000001", "password", 1234, 1, "crn").get_details()
+
+    assert registry.requests[("/api/meroShare/auth/", "POST", "200")] == 1
+    assert registry.endpoint_latency["/api/meroShare/bank/{id}"].count == 1
+
+    registry.write(tmp_path / "metrics.prom")
+    text = (tmp_path / "metrics.prom").read_text()
+    assert 'nepseutils_requests_total{endpoint="/api/meroShare/auth/",method="POST",status="200"} 1' in text
+    assert 'nepseutils_account_request_duration_seconds_count{account="Account 1"}' in text
+
+
+def test_apply_is_not_resent_after_read_timeout(fake_server, monkeypatch):
+    account = Account("1301000000000001", "password", 1234, 1, "crn")
+    payload = account.prepare_apply(101, 10)
+    posts = []
+
+    def timing_out_request(method, url, **kwargs):
+        posts.append(url)
+        raise requests.ReadTimeout("Read timed out")
+
+    monkeypatch.setattr(http.session(), "request", timing_out_request)
+
+    with pytest.raises(requests.ReadTimeout):
+        account.submit_apply(payload)
+
+    assert len(posts) == 1
+
+
+def test_use_limiter_overrides_shared_rate_limit(fake_server):
+    resilience.configure(rate=1, burst=1)
+    account = Account("1301000000000001", "password", 1234, 1, "crn")
+
+    try:
+        start = time.monotonic()
+        with resilience.use_limiter(TokenBucket(rate=0, capacity=0)):
+            account.get_details()
+
+        assert time.monotonic() - start < 1
+    finally:
+        resilience.configure()
+
+
+def test_apply_is_not_resent_when_history_refresh_fails(fake_server, monkeypatch):
+    apply_post = ("POST", "/api/meroShare/applicantForm/share/apply")
+    account = Account("1301000000000001", "password", 1234, 1, "crn")
+
+    def failing_refresh(self, refetch=False):
+        raise LocalException("Recent application list request failed!")
+
+    monkeypatch.setattr(Account, "fetch_applied_issues", failing_refresh)
+
+    assert account.apply(share_id=101, quantity=10)["status"] == "CREATED"
+    assert fake_server.requests[apply_post] == 1
@@ -0,0 +1,107 @@
+import threading
+import time
+from datetime import datetime
+
+from nepseutils.constants import (
+    SCHEDULER_CLOSING_INTERVAL,
+    SCHEDULER_IDLE_INTERVAL,
+    SCHEDULER_MARKET_INTERVAL,
+)
+from nepseutils.core.account import Account
+from nepseutils.core.errors import LocalException
+from nepseutils.core.scheduler import NEPAL_TIMEZONE, Scheduler
+
+APPLY_PATH = "/api/meroShare/applicantForm/share/apply"
+
+
+def test_poll_interval_adapts_to_market_hours_and_close_dates(meroshare):
+    scheduler = Scheduler(meroshare(count=2))
+    closing = [{"companyShareId": 1, "issueCloseDate": "Jan 07, 2024 5:00:00 PM"}]
+
+    # Sunday in Nepal
+    market = datetime(2024, 1, 7, 11, 0, tzinfo=NEPAL_TIMEZONE)
+    night = datetime(2024, 1, 7, 22, 0, tzinfo=NEPAL_TIMEZONE)
+    saturday = datetime(2024, 1, 6, 11, 0, tzinfo=NEPAL_TIMEZONE)
+
+    assert scheduler.poll_interval([], market) == SCHEDULER_MARKET_INTERVAL
+    assert scheduler.poll_interval([], night) == SCHEDULER_IDLE_INTERVAL
+    assert scheduler.poll_interval([], saturday) == SCHEDULER_IDLE_INTERVAL
+    assert scheduler.poll_interval(closing, datetime(2024, 1, 7, 16, 0, tzinfo=NEPAL_TIMEZONE)) == (
+        SCHEDULER_CLOSING_INTERVAL
+    )
+
+    scheduler.applied.add(1)
+    assert scheduler.poll_interval(closing, datetime(2024, 1, 7, 16, 0, tzinfo=NEPAL_TIMEZONE)) == (
+        SCHEDULER_MARKET_INTERVAL
+    )
+
+
+def test_tick_applies_new_issues_once(fake_server, meroshare):
+    ms = meroshare(count=2)
+    scheduler = Scheduler(ms, workers=2)
+
+    scheduler.tick()
+    scheduler.tick()
+    scheduler.wait_for_status_refresh()
+
+    assert scheduler.applied == {101}
+    assert fake_server.requests[("POST", APPLY_PATH)] == 2
+    assert all(account.issues.by_company_share_id(101) for account in ms.accounts)
+
+
+def test_failed_accounts_are_retried_next_tick(fake_server, meroshare, monkeypatch):
+    ms = meroshare(count=2)
+    scheduler = Scheduler(ms, workers=2)
+    apply = Account.apply
+    failing = {ms.accounts[1].dmat}
+
+    def flaky_apply(self, *args, **kwargs):
+        if self.dmat in failing:
+            raise LocalException("Apply failed!")
+        return apply(self, *args, **kwargs)
+
+    monkeypatch.setattr(Account, "apply", flaky_apply)
+
+    scheduler.tick()
+    scheduler.wait_for_status_refresh()
+    assert scheduler.applied == set()
+    assert scheduler.applied_accounts[101] == {ms.accounts[0].dmat}
+
+    failing.clear()
+    scheduler.tick()
+    scheduler.wait_for_status_refresh()
+
+    assert scheduler.applied == {101}
+    assert fake_server.requests[("POST", APPLY_PATH)] == 2
+
+
+def test_apply_does_not_wait_for_other_accounts_refresh(fake_server, meroshare, monkeypatch):
+    ms = meroshare(count=2)
+    scheduler = Scheduler(ms, workers=2)
+    refreshing, finish = threading.Event(), threading.Event()
+
+    def slow_refresh(account):
+        if account is ms.accounts[1]:
+            refreshing.set()
+            finish.wait(5)
+
+    monkeypatch.setattr("nepseutils.core.scheduler.refresh_issues", slow_refresh)
+    scheduler.refresh_statuses_in_background()
+    refreshing.wait(5)
+
+    ticking = threading.Thread(target=scheduler.tick)
+    ticking.start()
+
+    # The free account applies while the other one is still refreshing
+    deadline = time.monotonic() + 5
+    while not fake_server.requests[("POST", APPLY_PATH)] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert fake_server.requests[("POST", APPLY_PATH)] == 1
+    assert ticking.is_alive()
+
+    finish.set()
+    ticking.join(5)
+    scheduler.wait_for_status_refresh()
+
+    assert scheduler.applied == {101}
+    assert fake_server.requests[("POST", APPLY_PATH)] == 2
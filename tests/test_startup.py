@@ -0,0 +1,12 @@
+import subprocess
+import sys
+
+
+def test_cli_import_does_not_load_heavy_dependencies():
+    code = (
+        "import sys, nepseutils.__main__; "
+        "print(','.join(m for m in ('requests', 'cryptography', 'tabulate') if m in sys.modules))"
+    )
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+
+    assert output.stdout.strip() == ""
@@ -0,0 +1,168 @@
+import base64
+import json
+import os
+import threading
+
+import pytest
+
+from nepseutils.core.account import Account
+from nepseutils.core.meroshare import SEGMENT_DIRECTORY, MeroShare
+from nepseutils.utils.writer import WriteBehindWriter, atomic_write
+
+
+def write_legacy_config(path, password, accounts):
+    fernet = MeroShare.fernet_init(password)
+    data = fernet.encrypt(json.dumps([account.to_json() for account in accounts]).encode())
+    path.write_text(
+        json.dumps(
+            {
+                "config_version": "0.4.8",
+                "logging_level": 40,
+                "capitals": {"13010": 1},
+                "data": base64.b64encode(data).decode(),
+            }
+        )
+    )
+
+
+def test_legacy_config_is_migrated_to_segments(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    config_path = tmp_path / "config.json"
+    accounts = [Account(f"13010000000{i:05d}", "password", 1234, 1, "crn") for i in range(3)]
+    write_legacy_config(config_path, "secret", accounts)
+
+    ms = MeroShare.load("secret", config_path)
+    ms.close()
+
+    assert len(list((tmp_path / SEGMENT_DIRECTORY).iterdir())) == 3
+    assert (tmp_path / "config.json.bak").exists()
+    assert "data" not in json.loads(config_path.read_text())
+
+    reloaded = MeroShare.load("secret", config_path)
+    assert [account.dmat for account in reloaded.accounts] == [account.dmat for account in accounts]
+
+
+def test_save_rewrites_only_dirty_segments(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    config_path = tmp_path / "config.json"
+    write_legacy_config(
+        config_path,
+        "secret",
+        [Account(f"13010000000{i:05d}", "password", 1234, 1, "crn") for i in range(3)],
+    )
+    ms = MeroShare.load("secret", config_path)
+    ms.close()
+
+    segments = {path.name: path.read_bytes() for path in (tmp_path / SEGMENT_DIRECTORY).iterdir()}
+
+    ms = MeroShare.load("secret", config_path)
+    with ms.batch():
+        ms.accounts[1].tag = "family"
+        ms.accounts[1].save()
+        ms.accounts[1].save()
+    ms.close()
+
+    changed = [
+        path.name
+        for path in (tmp_path / SEGMENT_DIRECTORY).iterdir()
+        if segments[path.name] != path.read_bytes()
+    ]
+    assert len(changed) == 1
+
+    reloaded = MeroShare.load("secret", config_path)
+    assert [account.tag for account in reloaded.accounts] == [None, "family", None]
+
+    reloaded.remove_account(reloaded.accounts[0])
+    reloaded.close()
+    assert len(list((tmp_path / SEGMENT_DIRECTORY).iterdir())) == 2
+
+
+def test_saves_in_batch_are_written_once(meroshare, monkeypatch):
+    ms = meroshare(count=3)
+    ms.flush()
+    ms.wait_for_writes()
+
+    flushes, jobs = [], []
+    flush, submit = ms.flush, ms._writer.submit
+    monkeypatch.setattr(ms, "flush", lambda: flushes.append(flush()))
+    monkeypatch.setattr(ms._writer, "submit", lambda path, producer: jobs.append(submit(path, producer)))
+
+    with ms.batch():
+        for _ in range(3):
+            ms.save_data(ms.accounts[0])
+        ms.save_settings()
+
+        assert flushes == []
+
+    assert len(flushes) == 1
+    # The segment of the saved account and the config, not every account
+    assert len(jobs) == 2
+
+
+def test_writer_merges_jobs_for_the_same_path(tmp_path):
+    writer = WriteBehindWriter()
+    started, release = threading.Event(), threading.Event()
+    produced = []
+
+    def blocking():
+        started.set()
+        release.wait(5)
+        return b"first"
+
+    def producer(data: bytes):
+        def produce():
+            produced.append(data)
+            return data
+
+        return produce
+
+    writer.submit(tmp_path / "first", blocking)
+    started.wait(5)
+
+    for data in (b"1", b"2", b"3"):
+        writer.submit(tmp_path / "merged", producer(data))
+
+    release.set()
+    writer.close()
+
+    assert produced == [b"3"]
+    assert (tmp_path / "merged").read_bytes() == b"3"
+    assert (tmp_path / "first").read_bytes() == b"first"
+
+
+def test_writer_close_writes_pending_jobs(tmp_path):
+    writer = WriteBehindWriter()
+
+    for index in range(5):
+        writer.submit(tmp_path / f"file{index}", lambda index=index: str(index).encode())
+
+    writer.close()
+
+    assert [(tmp_path / f"file{index}").read_bytes() for index in range(5)] == [b"0", b"1", b"2", b"3", b"4"]
+    with pytest.raises(RuntimeError):
+        writer.submit(tmp_path / "late", lambda: b"late")
+
+
+def test_failed_write_keeps_old_file(tmp_path, monkeypatch):
+    path = tmp_path / "config.json"
+    path.write_bytes(b"old")
+
+    def failing_producer():
+        raise ValueError("Encryption failed!")
+
+    writer = WriteBehindWriter()
+    writer.submit(path, failing_producer)
+
+    with pytest.raises(ValueError):
+        writer.flush()
+    writer.close()
+
+    def failing_replace(source, destination):
+        raise OSError("Disk full!")
+
+    monkeypatch.setattr(os, "replace", failing_replace)
+
+    with pytest.raises(OSError):
+        atomic_write(path, b"new")
+
+    assert path.read_bytes() == b"old"
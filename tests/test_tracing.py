@@ -0,0 +1,46 @@
+from nepseutils.utils import tracing
+
+
+def test_spans_nest_across_worker_threads(fake_server, meroshare, tmp_path):
+    ms = meroshare(count=2)
+
+    tracing.configure(tmp_path / "trace.jsonl")
+    try:
+        ms.apply(share_id=101, quantity=10, workers=2)
+    finally:
+        tracing.configure(None)
+
+    spans = tracing.read(tmp_path / "trace.jsonl")
+    by_id = {span["span_id"]: span for span in spans}
+
+    post = next(span for span in spans if span["attributes"].get("endpoint", "").endswith("/share/apply"))
+    ancestors = []
+    parent = by_id.get(post["parent_id"])
+    while parent:
+        ancestors.append(parent["name"])
+        parent = by_id.get(parent["parent_id"])
+
+    assert ancestors == ["Account.submit_apply", "Account.apply", "task", "MeroShare.apply"]
+    assert post["attributes"]["status"] == 201
+    assert len({span["trace_id"] for span in spans}) == 1
+
+    assert "Account.apply" in tracing.timeline(spans)
+    assert "MeroShare.apply;task;Account.apply;Account.submit_apply;http " in tracing.folded(spans)
+
+
+def test_shell_commands_are_traced(fake_server, meroshare, tmp_path, capsys):
+    from nepseutils.__main__ import NepseUtils
+
+    cli = NepseUtils()
+    cli.ms = meroshare()
+
+    tracing.configure(tmp_path / "trace.jsonl")
+    try:
+        cli.onecmd("list accounts")
+    finally:
+        tracing.configure(None)
+
+    command = next(span for span in tracing.read(tmp_path / "trace.jsonl") if span["name"] == "command")
+    assert command["attributes"] == {"command": "list"}
+    assert command["error"] is None
+    assert "1301000000000001" in capsys.readouterr().out